@@ -25,6 +25,7 @@ import logging
 import os
 import random
 import tempfile
+import threading
 from datetime import datetime
 import queue as _unused_module_Queue
 
@@ -187,6 +188,53 @@ def _generate_email(subject_model, content_model, number_of_sentences=DEFAULT_NU
     return message
 
 
+_sessions = {}
+_session_lock = threading.Lock()
+
+
+def _get_session(max_retries, backoff_factor):
+    """Return a process-wide requests.Session, creating it on first use
+
+    Reusing one session keeps the connection pool alive between
+    downloads, so follow-up requests skip the TCP and TLS handshakes
+    and the adapter construction. The retry arguments are baked into
+    the session's adapter, so sessions are cached per
+    (max_retries, backoff_factor) rather than once for the process:
+    a caller passing different values gets a matching session instead
+    of silently inheriting the first caller's retry policy.
+    """
+    key = (max_retries, backoff_factor)
+    with _session_lock:
+        session = _sessions.get(key)
+        if session is None:
+            import requests
+            import sys
+            if hasattr(sys, 'frozen'):
+                # when frozen by py2exe, certificates are in alternate
+                # location
+                CA_BUNDLE = os.path.join(bleachbit_exe_path, 'cacert.pem')
+                requests.utils.DEFAULT_CA_BUNDLE_PATH = CA_BUNDLE
+                requests.adapters.DEFAULT_CA_BUNDLE_PATH = CA_BUNDLE
+            from urllib3.util.retry import Retry
+            from requests.adapters import HTTPAdapter
+            # 408: request timeout
+            # 429: too many requests
+            # 500: internal server error
+            # 502: bad gateway
+            # 503: service unavailable
+            # 504: gateway_timeout
+            status_forcelist = (408, 429, 500, 502, 503, 504)
+            # sourceforge.net directories to download mirror
+            retries = Retry(total=max_retries, backoff_factor=backoff_factor,
+                            status_forcelist=status_forcelist, redirect=5)
+            adapter = HTTPAdapter(max_retries=retries)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+    return session
+
+
 def download_url_to_fn(url, fn, on_error=None, max_retries=3, backoff_factor=0.5, timeout=60):
     """Download a URL to the given filename
 
@@ -204,25 +252,10 @@ def download_url_to_fn(url, fn, on_error=None, max_retries=3, backoff_factor=0.5
     """
     # FIXME: unify this with update_winapp2(), check_updates()
     logger.info('Downloading %s to %s', url, fn)
+    # requests (with urllib3, certifi, and friends) is imported lazily
+    # here and in _get_session() so that application startup does not
+    # pay for it unless a download actually happens.
     import requests
-    import sys
-    if hasattr(sys, 'frozen'):
-        # when frozen by py2exe, certificates are in alternate location
-        CA_BUNDLE = os.path.join(bleachbit_exe_path, 'cacert.pem')
-        requests.utils.DEFAULT_CA_BUNDLE_PATH = CA_BUNDLE
-        requests.adapters.DEFAULT_CA_BUNDLE_PATH = CA_BUNDLE
-    from urllib3.util.retry import Retry
-    from requests.adapters import HTTPAdapter
-    # 408: request timeout
-    # 429: too many requests
-    # 500: internal server error
-    # 502: bad gateway
-    # 503: service unavailable
-    # 504: gateway_timeout
-    status_forcelist = (408, 429, 500, 502, 503, 504)
-    # sourceforge.net directories to download mirror
-    retries = Retry(total=max_retries, backoff_factor=backoff_factor,
-                    status_forcelist=status_forcelist, redirect=5)
     msg = _('Downloading URL failed: %s') % url
 
     from bleachbit.Update import user_agent
@@ -233,25 +266,28 @@ def download_url_to_fn(url, fn, on_error=None, max_retries=3, backoff_factor=0.5
             on_error(msg, msg2)
         from bleachbit.FileUtilities import delete
         delete(fn, ignore_missing=True)  # delete any partial download
-    with requests.Session() as session:
-        session.mount('http://', HTTPAdapter(max_retries=retries))
-        try:
-            response = session.get(url, headers=headers, timeout=timeout)
-            content = response.content
-        except requests.exceptions.RequestException as exc:
-            msg2 = '{}: {}'.format(type(exc).__name__, exc)
-            logger.exception(msg)
-            do_error(msg2)
-            return False
-        else:
+    session = _get_session(max_retries, backoff_factor)
+    try:
+        # Stream the response to disk in chunks instead of holding the
+        # whole download in memory, so memory use stays constant
+        # regardless of the file size. The with block closes the
+        # streamed response on every path, releasing the connection
+        # back to the session's pool even when the status is not 200.
+        with session.get(
+                url, headers=headers, timeout=timeout, stream=True) as response:
             if not response.status_code == 200:
                 logger.error(msg)
                 msg2 = 'Status code: %s' % response.status_code
                 do_error(msg2)
                 return False
-
-    with open(fn, 'wb') as f:
-        f.write(content)
+            with open(fn, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+    except requests.exceptions.RequestException as exc:
+        msg2 = '{}: {}'.format(type(exc).__name__, exc)
+        logger.exception(msg)
+        do_error(msg2)
+        return False
     return True
 
 
@@ -27,19 +27,26 @@ import bleachbit
 from bleachbit import _
 
 import atexit
+import bisect
 import errno
+import fnmatch
+import functools
 import glob
+import itertools
 import locale
 import logging
+import mmap
 import os
 import os.path
 import random
 import re
+import shutil
 import stat
 import string
 import sys
 import subprocess
 import tempfile
+import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -56,30 +63,34 @@ if 'posix' == os.name:
     from bleachbit.General import WindowsError
     pywinerror = WindowsError
 
-try:
-    from scandir import walk
-    if 'nt' == os.name:
-        import scandir
-        import bleachbit.Windows
-
-        class _Win32DirEntryPython(scandir.Win32DirEntryPython):
-            def is_symlink(self):
-                return super(_Win32DirEntryPython, self).is_symlink() or bleachbit.Windows.is_junction(self.path)
-
-        scandir.scandir = scandir.scandir_python
-        scandir.DirEntry = scandir.Win32DirEntryPython = _Win32DirEntryPython
-except ImportError:
-    if sys.version_info < (3, 5, 0):
-        # Python 3.5 incorporated scandir
-        logger.warning(
-            'scandir is not available, so falling back to slower os.walk()')
-    from os import walk
-
-
 def open_files_linux():
     return glob.iglob("/proc/*/fd/*")
 
 
+# cached (timestamp, partitions) for get_filesystem_type()
+_partitions_cache = (0, None)
+
+
+def _get_partitions():
+    """Return (mountpoint, fstype, device) tuples, longest mountpoint first
+
+    Like OpenFiles, the result is cached for ten seconds because
+    enumerating partitions is slow and they rarely change.
+    """
+    global _partitions_cache
+    import psutil
+    (cache_time, partitions) = _partitions_cache
+    now = time.time()
+    if partitions is None or (now - cache_time) > 10:
+        partitions = sorted(
+            ((partition.mountpoint.rstrip(os.sep) + os.sep,
+              partition.fstype, partition.device)
+             for partition in psutil.disk_partitions()),
+            key=lambda partition: len(partition[0]), reverse=True)
+        _partitions_cache = (now, partitions)
+    return partitions
+
+
 def get_filesystem_type(path):
     """
     * Get file system type from the given path
@@ -93,23 +104,13 @@ def get_filesystem_type(path):
         logger.warning('To get the file system type from the given path, you need to install psutil package')
         return ("unknown", "none")
 
-    partitions = {
-        partition.mountpoint: (partition.fstype, partition.device)
-        for partition in psutil.disk_partitions()
-    }
-
-    if path in partitions:
-        return partitions[path]
-
-    splitpath = path.split(os.sep)
-    for i in range(0, len(splitpath)-1):
-        path = os.sep.join(splitpath[:i]) + os.sep
-        if path in partitions:
-            return partitions[path]
-            
-        path = os.sep.join(splitpath[:i])
-        if path in partitions:
-            return partitions[path]
+    # The longest mountpoint that is a prefix of the path is its
+    # partition, so one pass over the sorted list replaces walking up
+    # the directory tree one component at a time.
+    norm_path = os.path.realpath(path).rstrip(os.sep) + os.sep
+    for (mountpoint, fstype, device) in _get_partitions():
+        if norm_path.startswith(mountpoint):
+            return (fstype, device)
 
     return ("unknown", "none")
 
@@ -117,8 +118,17 @@ def get_filesystem_type(path):
 
 def open_files_lsof(run_lsof=None):
     if run_lsof is None:
-        def run_lsof():
-            return subprocess.check_output(["lsof", "-Fn", "-n"])
+        # Stream lsof's stdout line by line: its output can be many
+        # megabytes, and this filters while lsof is still running.
+        proc = subprocess.Popen(["lsof", "-Fn", "-n"],
+                                stdout=subprocess.PIPE,
+                                universal_newlines=True)
+        with proc.stdout:
+            for line in proc.stdout:
+                if line.startswith("n/"):
+                    yield line[1:].rstrip("\n")  # Drop lsof's "n"
+        proc.wait()
+        return
     for f in run_lsof().split("\n"):
         if f.startswith("n/"):
             yield f[1:]  # Drop lsof's "n"
@@ -152,7 +162,9 @@ class OpenFiles:
 
     def __init__(self):
         self.last_scan_time = None
-        self.files = []
+        self.files = frozenset()
+        self._realpath_cached = functools.lru_cache(maxsize=4096)(
+            os.path.realpath)
 
     def file_qualifies(self, filename):
         """Return boolean whether filename qualifies to enter cache (check \
@@ -163,22 +175,36 @@ class OpenFiles:
     def scan(self):
         """Update cache"""
         self.last_scan_time = time.time()
-        self.files = []
-        for filename in open_files():
-            if self.file_qualifies(filename):
-                self.files.append(filename)
+        # frozenset makes the membership test in is_open() constant time.
+        self.files = frozenset(
+            filename for filename in open_files()
+            if self.file_qualifies(filename))
+        # A rescan may change what paths resolve to.
+        self._realpath_cached.cache_clear()
 
     def is_open(self, filename):
         """Return boolean whether filename is open by running process"""
         if self.last_scan_time is None or (time.time() - self.last_scan_time) > 10:
             self.scan()
-        return os.path.realpath(filename) in self.files
+        # The cache holds real paths, so a literal match needs no
+        # realpath, which lstats every path component.
+        if filename in self.files:
+            return True
+        return self._realpath_cached(filename) in self.files
+
+
+_random_alphabet = string.ascii_letters + '0123456789_.-'
 
 
 def __random_string(length):
     """Return random alphanumeric characters of given length"""
-    return ''.join(random.choice(string.ascii_letters + '0123456789_.-')
-                   for i in range(length))
+    # random.choices draws all characters in one call, which matters
+    # because wipe_name() may retry this many times per path.
+    return ''.join(random.choices(_random_alphabet, k=length))
+
+
+# thresholds for the SI exponent in bytes_to_human()
+_si_thresholds = [1000 ** i for i in range(1, 7)]
 
 
 def bytes_to_human(bytes_i):
@@ -208,33 +234,167 @@ def bytes_to_human(bytes_i):
     else:
         decimals = 0
 
-    for exponent in range(0, len(prefixes)):
-        if bytes_i < base:
-            abbrev = round(bytes_i, decimals)
-            suf = prefixes[exponent]
-            return locale.str(abbrev) + suf + 'B'
-        else:
-            bytes_i /= base
-    return 'A lot.'
+    # Find the exponent directly instead of repeatedly dividing.
+    if 1024.0 == base:
+        exponent = (bytes_i.bit_length() - 1) // 10
+    else:
+        exponent = bisect.bisect_right(_si_thresholds, bytes_i)
+    if exponent >= len(prefixes):
+        return 'A lot.'
+    abbrev = round(bytes_i / base ** exponent, decimals)
+    return locale.str(abbrev) + prefixes[exponent] + 'B'
+
+
+def _walk_children(top, list_directories):
+    """Recursively yield paths under directory top using os.scandir
+
+    DirEntry objects carry the file type from the directory listing, so
+    deciding file versus directory usually costs no extra stat call.
+    Children are yielded before their parent directory, like
+    walk(topdown=False), so callers may delete directories in order.
+    """
+    try:
+        entries = os.scandir(top)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                recurse = entry.is_dir(follow_symlinks=False)
+                is_dir = recurse or entry.is_dir()
+            except OSError:
+                recurse = is_dir = False
+            if recurse and 'nt' == os.name and bleachbit.Windows.is_junction(entry.path):
+                # Do not descend into junctions, matching the symlink
+                # behavior below.
+                recurse = False
+            if recurse:
+                yield from _walk_children(entry.path, list_directories)
+            if is_dir:
+                # Directories include symlinks to directories, which are
+                # listed but not descended into.
+                if list_directories:
+                    yield entry.path
+            else:
+                yield entry.path
 
 
 def children_in_directory(top, list_directories=False):
     """Iterate files and, optionally, subdirectories in directory"""
-    if type(top) is tuple:
-        for top_ in top:
-            yield from children_in_directory(top_, list_directories)
-        return
-    for (dirpath, dirnames, filenames) in walk(top, topdown=False):
-        if list_directories:
-            for dirname in dirnames:
-                yield os.path.join(dirpath, dirname)
-        for filename in filenames:
-            yield os.path.join(dirpath, filename)
+    if isinstance(top, tuple):
+        return itertools.chain.from_iterable(
+            _walk_children(top_, list_directories) for top_ in top)
+    return _walk_children(top, list_directories)
+
+
+_ini_section_re = re.compile(r'\[(?P<header>.+)\]\s*$')
+_ini_option_re = re.compile(r'(?P<key>.*?)\s*[=:]\s*(?P<value>.*)$')
+
+
+def _clean_ini_streaming(path, section, parameter, encoding):
+    """Try to delete the section or parameter with one streaming pass
+
+    The file is filtered line by line into a temporary file that
+    replaces the original only when something was removed, so memory
+    use stays constant. Output matches what RawConfigParser would
+    write: comments and blank lines dropped, options as "key = value".
+    Returns True when handled (whether or not anything changed) and
+    False when the file needs the full parser: continuation lines,
+    duplicate sections or options, or lines the parser would reject.
+    Those all make the strict parser raise, so deferring keeps the
+    baseline behavior of logging an error and leaving the file alone.
+    """
+    changed = False
+    current_section = None
+    section_open = False
+    sections_seen = set()
+    options_seen = set()
+
+    (temp_fd, temp_path) = tempfile.mkstemp(
+        dir=os.path.dirname(path) or '.', prefix='bleachbit-ini')
+    try:
+        with open(path, 'r', encoding=encoding) as src, \
+                open(temp_fd, 'w', encoding=encoding, newline='') as dst:
+            for line in src:
+                stripped = line.strip()
+                if not stripped or stripped[0] in '#;':
+                    # the parser drops comments and blank lines on rewrite
+                    continue
+                if line[0] in ' \t':
+                    # a continuation line: defer to the full parser
+                    return False
+                header_match = _ini_section_re.match(stripped)
+                if header_match:
+                    current_section = header_match.group('header')
+                    if current_section in sections_seen:
+                        # DuplicateSectionError in the strict parser
+                        return False
+                    sections_seen.add(current_section)
+                    options_seen.clear()
+                    if section_open:
+                        dst.write('\n')
+                        section_open = False
+                    if current_section == section and parameter is None:
+                        changed = True
+                        continue
+                    dst.write('[%s]\n' % current_section)
+                    section_open = True
+                    continue
+                # Every option line is validated, including lines inside
+                # the section being removed: junk there makes the parser
+                # raise ParsingError, and the file must stay untouched.
+                option_match = _ini_option_re.match(stripped)
+                if not option_match:
+                    # unrecognized syntax: defer to the full parser
+                    return False
+                if current_section is None:
+                    # an option before any section header is an error
+                    # for RawConfigParser, so keep the file untouched
+                    return False
+                key = option_match.group('key')
+                if key in options_seen:
+                    # DuplicateOptionError in the strict parser
+                    return False
+                options_seen.add(key)
+                if current_section == section and parameter is None:
+                    # inside the section being removed
+                    changed = True
+                    continue
+                if current_section == section and key == parameter:
+                    changed = True
+                    continue
+                dst.write('%s = %s\n' % (key, option_match.group('value')))
+            if section_open:
+                dst.write('\n')
+        if changed:
+            from bleachbit.Options import options
+            # mkstemp creates the file 0600, so carry over the mode and,
+            # where supported, the ownership of the original file (for
+            # example, when cleaning as root for another user).
+            file_stat = os.stat(path)
+            os.chmod(temp_path, stat.S_IMODE(file_stat.st_mode))
+            if hasattr(os, 'chown'):
+                try:
+                    os.chown(temp_path, file_stat.st_uid, file_stat.st_gid)
+                except OSError:
+                    logger.debug('os.chown(%s) failed', temp_path)
+            if options.get('shred'):
+                delete(path, True, ignore_missing=True)
+            os.replace(temp_path, path)
+            temp_path = None
+        return True
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 
 def clean_ini(path, section, parameter):
     """Delete sections and parameters (aka option) in the file"""
 
+    encoding = detect_encoding(path) or 'utf_8_sig'
+    if _clean_ini_streaming(path, section, parameter, encoding):
+        return
+
     def write(parser, ini_file):
         """
         Reimplementation of the original RowConfigParser write function.
@@ -261,8 +421,6 @@ def clean_ini(path, section, parameter):
                 ini_file.write("%s\n" % (key))
             ini_file.write("\n")
 
-    encoding = detect_encoding(path) or 'utf_8_sig'
-
     # read file to parser
     config = bleachbit.RawConfigParser()
     config.optionxform = lambda option: option
@@ -293,12 +451,24 @@ def clean_ini(path, section, parameter):
 def clean_json(path, target):
     """Delete key in the JSON file"""
     import json
+    try:
+        # optional: much faster parsing of large browser profiles
+        import orjson
+    except ImportError:
+        orjson = None
     changed = False
     targets = target.split('/')
 
     # read file to parser
-    with open(path, 'r', encoding='utf-8-sig') as f:
-        js = json.load(f)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if orjson:
+        # orjson does not accept a byte-order mark
+        if raw.startswith(b'\xef\xbb\xbf'):
+            raw = raw[3:]
+        js = orjson.loads(raw)
+    else:
+        js = json.loads(raw.decode('utf-8-sig'))
 
     # change file
     pos = js
@@ -325,8 +495,11 @@ def clean_json(path, target):
         if options.get('shred'):
             delete(path, True)
         # write file
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(js, f)
+        with open(path, 'wb') as f:
+            if orjson:
+                f.write(orjson.dumps(js))
+            else:
+                f.write(json.dumps(js).encode('utf-8'))
 
 
 def delete(path, shred=False, ignore_missing=False, allow_shred=True):
@@ -417,23 +590,15 @@ def detect_encoding(fn):
             'chardet module is not available to detect character encoding')
         return None
 
+    # A bounded prefix of the file is enough for detection, and one
+    # buffer passed to chardet in a single call avoids materializing the
+    # whole file as a list of lines.
     with open(fn, 'rb') as f:
-        if not hasattr(chardet, 'universaldetector'):
-            # This method works on Ubuntu 16.04 with an older version of the module.
-            rawdata = f.read()
-            det = chardet.detect(rawdata)
-            if det['confidence'] > 0.5:
-                return det['encoding']
-            return None
-
-        # This method is faster, but it requires a newer version of the module.
-        detector = chardet.universaldetector.UniversalDetector()
-        for line in f.readlines():
-            detector.feed(line)
-            if detector.done:
-                break
-        detector.close()
-    return detector.result['encoding']
+        rawdata = f.read(65536)
+    det = chardet.detect(rawdata)
+    if det['confidence'] > 0.5:
+        return det['encoding']
+    return None
 
 
 def ego_owner(filename):
@@ -441,13 +606,36 @@ def ego_owner(filename):
     return os.lstat(filename).st_uid == os.getuid()
 
 
+# cached (PATH value, directories) for exists_in_path()
+_path_cache = (None, ())
+
+
+def _get_path_dirs():
+    """Return the unique directories in PATH, preserving order
+
+    The split and deduplication are cached until PATH changes, so
+    repeated lookups do not re-scan duplicate directories.
+    """
+    global _path_cache
+    path_env = os.environ.get('PATH', '')
+    (cached_env, dirs) = _path_cache
+    if path_env != cached_env:
+        delimiter = ';' if 'nt' == os.name else ':'
+        dirs = tuple(dict.fromkeys(
+            dirname for dirname in path_env.split(delimiter) if dirname))
+        _path_cache = (path_env, dirs)
+    return dirs
+
+
 def exists_in_path(filename):
     """Returns boolean whether the filename exists in the path"""
-    delimiter = ':'
-    if 'nt' == os.name:
-        delimiter = ';'
-    for dirname in os.getenv('PATH').split(delimiter):
-        if os.path.exists(os.path.join(dirname, filename)):
+    for dirname in _get_path_dirs():
+        candidate = os.path.join(dirname, filename)
+        if 'posix' == os.name:
+            # an executable is what PATH lookups are for
+            if os.access(candidate, os.X_OK):
+                return True
+        elif os.path.exists(candidate):
             return True
     return False
 
@@ -464,31 +652,29 @@ def execute_sqlite3(path, cmds):
     """Execute 'cmds' on SQLite database 'path'"""
     import sqlite3
     import contextlib
-    with contextlib.closing(sqlite3.connect(path)) as conn:
-        cursor = conn.cursor()
 
-        # overwrites deleted content with zeros
-        # https://www.sqlite.org/pragma.html#pragma_secure_delete
-        from bleachbit.Options import options
-        if options.get('shred'):
-            cursor.execute('PRAGMA secure_delete=ON')
+    # overwrites deleted content with zeros
+    # https://www.sqlite.org/pragma.html#pragma_secure_delete
+    from bleachbit.Options import options
+    if options.get('shred'):
+        cmds = 'PRAGMA secure_delete=ON;' + cmds
 
-        for cmd in cmds.split(';'):
-            try:
-                cursor.execute(cmd)
-            except sqlite3.OperationalError as exc:
-                if str(exc).find('no such function: ') >= 0:
-                    # fixme: determine why randomblob and zeroblob are not
-                    # available
-                    logger.exception(exc.message)
-                else:
-                    raise sqlite3.OperationalError(
-                        '%s: %s' % (exc, path))
-            except sqlite3.DatabaseError as exc:
-                raise sqlite3.DatabaseError(
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        try:
+            # executescript() lets SQLite split and run the statements
+            # in C, one boundary crossing instead of one per statement.
+            conn.executescript(cmds)
+        except sqlite3.OperationalError as exc:
+            if str(exc).find('no such function: ') >= 0:
+                # fixme: determine why randomblob and zeroblob are not
+                # available
+                logger.exception(str(exc))
+            else:
+                raise sqlite3.OperationalError(
                     '%s: %s' % (exc, path))
-
-        cursor.close()
+        except sqlite3.DatabaseError as exc:
+            raise sqlite3.DatabaseError(
+                '%s: %s' % (exc, path))
         conn.commit()
 
 
@@ -500,11 +686,15 @@ def expand_glob_join(pathname1, pathname2):
     return ret
 
 
+# matches a Sysnative path component without splitting the path
+_sysnative_re = re.compile(r'(?:^|\\)Sysnative(?:\\|$)', re.IGNORECASE)
+
+
 def extended_path(path):
     """If applicable, return the extended Windows pathname"""
     # Do not extend the Sysnative paths because on some systems there are problems with path resolution,
     # for example: https://github.com/bleachbit/bleachbit/issues/1574.
-    if 'nt' == os.name and 'Sysnative' not in path.split(os.sep):
+    if 'nt' == os.name and not _sysnative_re.search(path):
         if path.startswith(r'\\?'):
             return path
         if path.startswith(r'\\'):
@@ -526,8 +716,9 @@ def extended_path_undo(path):
 def free_space(pathname):
     """Return free space in bytes"""
     if 'nt' == os.name:
-        import psutil
-        return psutil.disk_usage(pathname).free
+        # shutil.disk_usage is a thin stdlib wrapper around
+        # GetDiskFreeSpaceExW, so it avoids importing psutil here.
+        return shutil.disk_usage(pathname).free
     mystat = os.statvfs(pathname)
     return mystat.f_bfree * mystat.f_bsize
 
@@ -562,12 +753,39 @@ def getsize(path):
     return os.path.getsize(path)
 
 
+def _file_entries(top):
+    """Recursively yield scandir entries for files under directory top"""
+    try:
+        entries = os.scandir(top)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if is_dir and 'nt' == os.name and bleachbit.Windows.is_junction(entry.path):
+                continue
+            if is_dir:
+                yield from _file_entries(entry.path)
+            else:
+                yield entry
+
+
 def getsizedir(path):
     """Return the size of the contents of a directory"""
-    total_bytes = sum(
-        getsize(node)
-        for node in children_in_directory(path, list_directories=False)
-    )
+    # Reuse the stat information cached on each scandir entry instead of
+    # calling getsize(), which would stat every path a second time.
+    total_bytes = 0
+    for entry in _file_entries(path):
+        try:
+            if 'posix' == os.name:
+                total_bytes += entry.stat(follow_symlinks=False).st_blocks * 512
+            else:
+                total_bytes += entry.stat().st_size
+        except OSError:
+            total_bytes += getsize(entry.path)
     return total_bytes
 
 
@@ -576,10 +794,30 @@ def globex(pathname, regex):
     if type(pathname) is tuple:
         for singleglob in pathname:
             yield from globex(singleglob, regex)
-    else:
-        for path in glob.iglob(pathname):
-            if re.search(regex, path):
-                yield path
+        return
+    cre = re.compile(regex)
+    (parent, leaf) = os.path.split(pathname)
+    if parent and leaf and not glob.has_magic(parent) and glob.has_magic(leaf):
+        # When only the last component is a pattern, one scandir pass
+        # with a precompiled matcher replaces glob's directory listing
+        # and per-entry fnmatch.
+        flags = re.IGNORECASE if 'nt' == os.name else 0
+        leaf_match = re.compile(fnmatch.translate(leaf), flags).match
+        try:
+            entries = os.scandir(parent)
+        except OSError:
+            return
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.') and not leaf.startswith('.'):
+                    # glob does not match hidden files by default
+                    continue
+                if leaf_match(entry.name) and cre.search(entry.path):
+                    yield entry.path
+        return
+    for path in glob.iglob(pathname):
+        if cre.search(path):
+            yield path
 
 
 def guess_overwrite_paths():
@@ -610,6 +848,12 @@ def guess_overwrite_paths():
     return ret
 
 
+# precompiled for human_to_bytes(), which is called in preview loops
+_human_si_re = re.compile(r'^(\d+(?:\.\d+)?) ?([kMGTE]?)B?$')
+_human_du_re = re.compile(r'^(\d+(?:\.\d+)?) ?([KMGTE]?)B?$')
+_human_exponent = {'': 0, 'k': 1, 'K': 1, 'M': 2, 'G': 3, 'T': 4, 'E': 5}
+
+
 def human_to_bytes(human, hformat='si'):
     """Convert a string like 10.2GB into bytes.  By
     default use SI standard (base 10).  The format of the
@@ -617,23 +861,17 @@ def human_to_bytes(human, hformat='si'):
 
     if 'si' == hformat:
         base = 1000
-        suffixes = 'kMGTE'
+        matches = _human_si_re.match(human)
     elif 'du' == hformat:
         base = 1024
-        suffixes = 'KMGTE'
+        matches = _human_du_re.match(human)
     else:
         raise ValueError("Invalid format: '%s'" % hformat)
-    matches = re.match(r'^(\d+(?:\.\d+)?) ?([' + suffixes + ']?)B?$', human)
     if matches is None:
         raise ValueError("Invalid input for '%s' (hformat='%s')" %
                          (human, hformat))
     (amount, suffix) = matches.groups()
-
-    if '' == suffix:
-        exponent = 0
-    else:
-        exponent = suffixes.find(suffix) + 1
-    return int(float(amount) * base**exponent)
+    return int(float(amount) * base**_human_exponent[suffix])
 
 
 def is_dir_empty(dirname):
@@ -641,30 +879,12 @@ def is_dir_empty(dirname):
 
     It assumes the path exists and is a directory.
     """
-    if hasattr(os, 'scandir'):
-        if sys.version_info < (3, 6, 0):
-                    # Python 3.5 added os.scandir() without context manager.
-            for _ in os.scandir(dirname):
-                return False
-        else:
-            # Python 3.6 added the context manager.
-            with os.scandir(dirname) as it:
-                for _entry in it:
-                    return False
-        return True
-    # This method is slower, but it works with Python 3.4.
-    return len(os.listdir(dirname)) == 0
+    with os.scandir(dirname) as it:
+        return next(it, None) is None
 
 
-def listdir(directory):
-    """Return full path of files in directory.
-
-    Path may be a tuple of directories."""
-
-    if type(directory) is tuple:
-        for dirname in directory:
-            yield from listdir(dirname)
-        return
+def _listdir_one(directory):
+    """Yield the full path of each file in one directory"""
     dirname = os.path.expanduser(directory)
     if not os.path.lexists(dirname):
         return
@@ -672,9 +892,32 @@ def listdir(directory):
         yield os.path.join(dirname, filename)
 
 
+def listdir(directory):
+    """Return full path of files in directory.
+
+    Path may be a tuple of directories."""
+
+    if isinstance(directory, tuple):
+        return itertools.chain.from_iterable(
+            _listdir_one(dirname) for dirname in directory)
+    return _listdir_one(directory)
+
+
+@functools.lru_cache(maxsize=64)
+def _statvfs_cached(path, time_bucket):
+    """Return os.statvfs for path; time_bucket expires stale entries"""
+    return os.statvfs(path)
+
+
 def same_partition(dir1, dir2):
     """Are both directories on the same partition?"""
     if 'nt' == os.name:
+        # Same drive letter means same partition, without any
+        # GetDiskFreeSpaceExW call.
+        drive1 = os.path.splitdrive(dir1)[0]
+        drive2 = os.path.splitdrive(dir2)[0]
+        if drive1 and drive2:
+            return drive1.lower() == drive2.lower()
         try:
             return free_space(dir1) == free_space(dir2)
         except pywinerror as e:
@@ -686,8 +929,11 @@ def same_partition(dir1, dir2):
                 # https://github.com/az0/bleachbit/issues/27
                 return dir1[0] == dir2[0]
             raise
-    stat1 = os.statvfs(dir1)
-    stat2 = os.statvfs(dir2)
+    # Bucket the time so repeated queries for the same directories
+    # reuse one statvfs result for about 30 seconds.
+    time_bucket = int(time.monotonic() // 30)
+    stat1 = _statvfs_cached(dir1, time_bucket)
+    stat2 = _statvfs_cached(dir2, time_bucket)
     return stat1[stat.ST_DEV] == stat2[stat.ST_DEV]
 
 
@@ -703,6 +949,34 @@ def sync():
         ctypes.cdll.LoadLibrary('msvcrt.dll')._flushall()
 
 
+# SYNC_FILE_RANGE_WRITE from <linux/fs.h>
+_SYNC_FILE_RANGE_WRITE = 2
+_sync_file_range_fn = None
+
+
+def _sync_file_range(fd, offset, nbytes):
+    """Start writeback of the given file range without waiting for it
+
+    Unlike fsync(), this returns immediately, so writeback overlaps with
+    subsequent writes instead of accumulating dirty pages for one large
+    flush at the end. Linux only; a no-op where sync_file_range(2) is
+    unavailable.
+    """
+    global _sync_file_range_fn
+    if _sync_file_range_fn is None:
+        import ctypes
+        try:
+            libc = ctypes.CDLL('libc.so.6', use_errno=True)
+            fn = libc.sync_file_range
+            fn.argtypes = (ctypes.c_int, ctypes.c_int64,
+                           ctypes.c_int64, ctypes.c_uint)
+            _sync_file_range_fn = fn
+        except (OSError, AttributeError):
+            _sync_file_range_fn = False
+    if _sync_file_range_fn:
+        _sync_file_range_fn(fd, offset, nbytes, _SYNC_FILE_RANGE_WRITE)
+
+
 def truncate_f(f):
     """Truncate the file object"""
     try:
@@ -745,13 +1019,13 @@ def whitelisted_posix(path, check_realpath=True):
             return True
         # resolve symlink
         path = os.path.realpath(path)
-    for pathname in options.get_whitelist_paths():
-        if pathname[0] == 'file' and path == pathname[1]:
+    for (p_type, match_path, match_prefix) in options.get_whitelist_paths_prepared():
+        if p_type == 'file' and path == match_path:
             return True
-        if pathname[0] == 'folder':
-            if path == pathname[1]:
+        if p_type == 'folder':
+            if path == match_path:
                 return True
-            if path.startswith(pathname[1] + os.sep):
+            if path.startswith(match_prefix):
                 return True
     return False
 
@@ -759,17 +1033,19 @@ def whitelisted_posix(path, check_realpath=True):
 def whitelisted_windows(path):
     """Check whether this Windows path is whitelisted"""
     from bleachbit.Options import options
-    for pathname in options.get_whitelist_paths():
-        # Windows is case insensitive
-        if pathname[0] == 'file' and path.lower() == pathname[1].lower():
+    # Windows is case insensitive, and the prepared whitelist is already
+    # lowercased, so fold the query once instead of per entry.
+    path_lower = path.lower()
+    for (p_type, match_path, match_prefix) in options.get_whitelist_paths_prepared():
+        if p_type == 'file' and path_lower == match_path:
             return True
-        if pathname[0] == 'folder':
-            if path.lower() == pathname[1].lower():
+        if p_type == 'folder':
+            if path_lower == match_path:
                 return True
-            if path.lower().startswith(pathname[1].lower() + os.sep):
+            if path_lower.startswith(match_prefix):
                 return True
             # Simple drive letter like C:\ matches everything below
-            if len(pathname[1]) == 3 and path.lower().startswith(pathname[1].lower()):
+            if len(match_path) == 3 and path_lower.startswith(match_path):
                 return True
     return False
 
@@ -780,6 +1056,18 @@ else:
     whitelisted = whitelisted_posix
 
 
+# Shared zero buffer for the wipe functions, built once and reused to
+# avoid a 1 MiB allocation per wiped file. An anonymous mmap is
+# page-aligned by construction, which O_DIRECT requires.
+_wipe_buffer_size = 1 << 20
+_wipe_buffer = mmap.mmap(-1, _wipe_buffer_size)
+# How many bytes to write before asking the kernel to start writeback.
+_wipe_sync_interval = 4 << 20
+# Opt-in: open wipe files with O_DIRECT so the zeros stream straight to
+# the device instead of churning the page cache (Linux only).
+wipe_direct_io = os.getenv('BLEACHBIT_WIPE_DIRECT_IO') == '1'
+
+
 def wipe_contents(path, truncate=True):
     """Wipe files contents
 
@@ -799,10 +1087,21 @@ def wipe_contents(path, truncate=True):
                 f = open(path, 'wb')
             else:
                 raise
-        blanks = b'\0' * 4096
-        while size > 0:
-            f.write(blanks)
-            size -= 4096
+        if 'posix' == os.name and size > 0:
+            try:
+                # Reserve the space up front so the allocator can keep
+                # the extents contiguous.
+                os.posix_fallocate(f.fileno(), 0, size)
+            except OSError:
+                # Not supported by all file systems.
+                pass
+        # Large chunks mean fewer system calls, so the loop is bound by
+        # disk bandwidth instead of call overhead.
+        (full_chunks, remainder) = divmod(size, _wipe_buffer_size)
+        for _i in range(full_chunks):
+            f.write(_wipe_buffer)
+        if remainder:
+            f.write(_wipe_buffer[:remainder])
         f.flush()  # flush to OS buffer
         os.fsync(f.fileno())  # force write to disk
         return f
@@ -885,19 +1184,68 @@ def wipe_name(pathname1):
     return pathname3
 
 
+def _is_rotational(pathname):
+    """Return whether the device behind the path is a spinning disk
+
+    Concurrent writers help only where the device benefits from queue
+    depth, so unknown means True (keep the serial writer).
+    """
+    if not sys.platform.startswith('linux'):
+        return True
+    try:
+        dev = os.stat(pathname).st_dev
+        sysfs = os.path.realpath(
+            '/sys/dev/block/%d:%d' % (os.major(dev), os.minor(dev)))
+        rotational = os.path.join(sysfs, 'queue', 'rotational')
+        if not os.path.exists(rotational):
+            # a partition: look at its parent block device
+            rotational = os.path.join(
+                os.path.dirname(sysfs), 'queue', 'rotational')
+        with open(rotational) as f:
+            return f.read().strip() != '0'
+    except OSError:
+        return True
+
+
 def wipe_path(pathname, idle=False):
     """Wipe the free space in the path
     This function uses an iterator to update the GUI."""
 
     def temporaryfile():
+        if sys.platform.startswith('linux'):
+            # O_TMPFILE creates the file with no directory entry, so
+            # its space is reclaimed when it is closed, even if the
+            # application closes prematurely.
+            flags = os.O_TMPFILE | os.O_WRONLY | os.O_CLOEXEC
+            if wipe_direct_io:
+                try:
+                    # Bypass the page cache: the zeros are useless once
+                    # on disk, so caching them only evicts useful pages
+                    # and ends in a flush storm.
+                    fd = os.open(pathname, flags | os.O_DIRECT, 0o600)
+                except OSError:
+                    # the file system does not support O_DIRECT
+                    pass
+                else:
+                    return os.fdopen(fd, 'wb', 0)
+            try:
+                fd = os.open(pathname, flags, 0o600)
+            except OSError:
+                # the kernel or file system does not support O_TMPFILE
+                pass
+            else:
+                # Unbuffered, so writes go straight to the kernel and
+                # f.tell() reflects writes made directly on the descriptor.
+                return os.fdopen(fd, 'wb', 0)
         # reference
         # http://en.wikipedia.org/wiki/Comparison_of_file_systems#Limits
         maxlen = 185
+        suffix = __random_string(maxlen)
         f = None
         while True:
             try:
                 f = tempfile.NamedTemporaryFile(
-                    dir=pathname, suffix=__random_string(maxlen), delete=False)
+                    dir=pathname, suffix=suffix, delete=False, buffering=0)
                 # In case the application closes prematurely, make sure this
                 # file is deleted
                 atexit.register(
@@ -913,40 +1261,141 @@ def wipe_path(pathname, idle=False):
                     # when the path is too long such as %TEMP% but not in C:\
                     if maxlen > 5:
                         maxlen -= 5
+                        suffix = __random_string(maxlen)
                         continue
                 raise
         return f
 
     def estimate_completion():
-        """Return (percent, seconds) to complete"""
-        remaining_bytes = free_space(pathname)
-        done_bytes = start_free_bytes - remaining_bytes
-        if done_bytes < 0:
+        """Return (phase, percent, seconds) to complete
+
+        Progress comes from the byte counters the write loop already
+        maintains, so this makes no statvfs round trip — that matters
+        on network mounts, where statvfs itself can stall the GUI
+        yield. The leading phase number is consumed by Worker.
+        """
+        done_bytes = total_bytes + writtensize
+        remaining_bytes = start_free_bytes - done_bytes
+        if remaining_bytes < 0:
             # maybe user deleted large file after starting wipe
-            done_bytes = 0
+            remaining_bytes = 0
         if 0 == start_free_bytes:
             done_percent = 0
         else:
-            done_percent = 1.0 * done_bytes / (start_free_bytes + 1)
+            done_percent = min(1.0, 1.0 * done_bytes / (start_free_bytes + 1))
         done_time = time.time() - start_time
         rate = done_bytes / (done_time + 0.0001)  # bytes per second
         remaining_seconds = int(remaining_bytes / (rate + 0.0001))
         return 1, done_percent, remaining_seconds
 
-    logger.debug(_("Wiping path: %s") % pathname)
+    # Debug-only diagnostics are not translated: each _() call is a
+    # catalog lookup, usually for a string that is then discarded.
+    logger.debug("Wiping path: %s", pathname)
     if not os.path.isdir(pathname):
         logger.error(_("Path to wipe must be an existing directory: %s"), pathname)
         return
     files = []
     total_bytes = 0
+    writtensize = 0
     start_free_bytes = free_space(pathname)
     start_time = time.time()
+    # Get the file system type from the given path
+    fstype = get_filesystem_type(pathname)[0]
+    logging.debug('File System:' + fstype)
+    if (sys.platform.startswith('linux') and 'vfat' != fstype
+            and not _is_rotational(pathname)):
+        # SSDs keep several outstanding writes in flight, so a few
+        # concurrent writers use queue depth that a single thread leaves
+        # idle. Spinning disks seek-thrash under concurrent writers and
+        # take the serial loop below instead.
+        stats_lock = threading.Lock()
+        stop_event = threading.Event()
+        errors = []
+
+        def fill_files():
+            """Create and fill wipe files until the disk is full"""
+            nonlocal total_bytes
+            while not stop_event.is_set():
+                try:
+                    f = temporaryfile()
+                except OSError as e:
+                    if e.errno in (errno.EMFILE, errno.ENOSPC):
+                        return
+                    errors.append(e)
+                    return
+                fd = f.fileno()
+                direct_io = False
+                if wipe_direct_io:
+                    import fcntl
+                    direct_io = bool(
+                        fcntl.fcntl(fd, fcntl.F_GETFL) & os.O_DIRECT)
+                blanks = memoryview(_wipe_buffer)
+                size = 0
+                last_sync_offset = 0
+                another_file = False
+                while not stop_event.is_set():
+                    try:
+                        n = os.write(fd, blanks)
+                    except OSError as e:
+                        if e.errno == errno.ENOSPC:
+                            if len(blanks) > (4096 if direct_io else 1):
+                                blanks = blanks[:len(blanks) // 2]
+                                continue
+                            break
+                        if e.errno == errno.EFBIG:
+                            another_file = True
+                            break
+                        if e.errno == errno.EINVAL and direct_io:
+                            break
+                        errors.append(e)
+                        break
+                    size += n
+                    with stats_lock:
+                        total_bytes += n
+                    bytes_since_sync = size - last_sync_offset
+                    if bytes_since_sync >= _wipe_sync_interval:
+                        _sync_file_range(fd, last_sync_offset,
+                                         bytes_since_sync)
+                        last_sync_offset = size
+                if not direct_io:
+                    os.fsync(fd)
+                with stats_lock:
+                    files.append(f)
+                if not another_file:
+                    # The disk is full; wind down the other writers.
+                    stop_event.set()
+                    return
+
+        threads = [threading.Thread(target=fill_files,
+                                    name='wipe_path-%d' % i)
+                   for i in range(min(4, os.cpu_count() or 1))]
+        for thread in threads:
+            thread.start()
+        try:
+            last_idle = time.time()
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.25)
+                if idle and (time.time() - last_idle) > 2:
+                    # Keep the GUI responding, and allow the user to
+                    # abort. Also display the ETA.
+                    yield estimate_completion()
+                    last_idle = time.time()
+        finally:
+            # Also reached when the consumer abandons the generator to
+            # abort: stop the writers before cleanup.
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        _wipe_path_finish(pathname, files, total_bytes, start_time)
+        return
     # Because FAT32 has a maximum file size of 4,294,967,295 bytes,
     # this loop is sometimes necessary to create multiple files.
     while True:
         try:
             logger.debug(
-                _('Creating new, temporary file for wiping free space.'))
+                'Creating new, temporary file for wiping free space.')
             f = temporaryfile()
         except OSError as e:
             # Linux gives errno 24
@@ -956,55 +1405,87 @@ def wipe_path(pathname, idle=False):
             else:
                 raise
 
-        # Get the file system type from the given path
-        fstype = get_filesystem_type(pathname)
-        fstype = fstype[0]
-        logging.debug('File System:' + fstype)
         # print(f.name) # Added by Marvin for debugging #issue 1051
         last_idle = time.time()
-        # Write large blocks to quickly fill the disk.
-        blanks = b'\0' * 65536
+        writes_since_time_check = 0
+        # Write large blocks to quickly fill the disk. The buffer is
+        # allocated once at module scope, and os.write() on the raw
+        # descriptor avoids the copy through Python's buffered I/O layer.
+        fd = f.fileno()
+        direct_io = False
+        if wipe_direct_io and sys.platform.startswith('linux'):
+            import fcntl
+            direct_io = bool(fcntl.fcntl(fd, fcntl.F_GETFL) & os.O_DIRECT)
+        # A memoryview of the shared buffer shrinks by reslicing, without
+        # allocating a new zero block each time ENOSPC halves the size.
+        blanks = memoryview(_wipe_buffer)
         writtensize = 0
-        
+        if 'posix' == os.name and fstype != 'vfat':
+            try:
+                # Reserve the free space up front so the allocator works in
+                # large extents instead of growing the file one block at a
+                # time. The zeros must still be written afterwards:
+                # fallocate() marks extents unwritten without overwriting
+                # the old contents on disk.
+                os.posix_fallocate(fd, 0, free_space(pathname))
+            except OSError:
+                # Not supported by all file systems, or the free space
+                # changed since it was measured.
+                pass
+
+        last_sync_offset = 0
         while True:
             try:
                 if fstype != 'vfat':
-                    f.write(blanks)
+                    writtensize += os.write(fd, blanks)
                 # In the ubuntu system, the size of file should be less then 4GB. If not, there should be EFBIG error.
                 # So the maximum file size should be less than or equal to "4GB - 65536byte".
-                elif writtensize < 4 * 1024 * 1024 * 1024 - 65536:
-                    writtensize += f.write(blanks)
+                elif writtensize < 4 * 1024 * 1024 * 1024 - len(blanks):
+                    writtensize += os.write(fd, blanks)
                 else:
                     break
-            
+                if sys.platform.startswith('linux'):
+                    # Start writeback every few MiB so it runs in parallel
+                    # with the remaining writes, instead of a single large
+                    # flush at fsync() that stalls the whole system.
+                    bytes_since_sync = writtensize - last_sync_offset
+                    if bytes_since_sync >= _wipe_sync_interval:
+                        _sync_file_range(
+                            fd, last_sync_offset, bytes_since_sync)
+                        last_sync_offset = writtensize
+
             except IOError as e:
                 if e.errno == errno.ENOSPC:
-                    if len(blanks) > 1:
-                        # Try writing smaller blocks
-                        blanks = blanks[0:len(blanks) // 2]
+                    # Try writing smaller blocks; O_DIRECT requires
+                    # block-aligned sizes, so stop at one page there.
+                    if len(blanks) > (4096 if direct_io else 1):
+                        blanks = blanks[:len(blanks) // 2]
                     else:
                         break
                 elif e.errno == errno.EFBIG:
                     break
+                elif e.errno == errno.EINVAL and direct_io:
+                    # the alignment constraint can no longer be met
+                    break
                 else:
                     raise
-            if idle and (time.time() - last_idle) > 2:
-                # Keep the GUI responding, and allow the user to abort.
-                # Also display the ETA.
-                yield estimate_completion()
-                last_idle = time.time()
-        # Write to OS buffer
-        try:
-            f.flush()
-        except IOError as e:
-            # IOError: [Errno 28] No space left on device
-            # seen on Microsoft Windows XP SP3 with ~30GB free space but
-            # not on another XP SP3 with 64MB free space
-            if not e.errno == errno.ENOSPC:
-                logger.error(
-                    _("Error #%d when flushing the file buffer." % e.errno))
-
-        os.fsync(f.fileno())  # write to disk
+            if idle:
+                # Sample the clock only every 64 writes; the 2-second
+                # yield cadence is coarse enough that the jitter does
+                # not matter.
+                writes_since_time_check += 1
+                if writes_since_time_check >= 64:
+                    writes_since_time_check = 0
+                    if (time.time() - last_idle) > 2:
+                        # Keep the GUI responding, and allow the user to
+                        # abort. Also display the ETA.
+                        yield estimate_completion()
+                        last_idle = time.time()
+        # The file is unbuffered, so there is nothing to flush at the
+        # Python layer before asking the kernel to write to disk.
+        if not direct_io:
+            # O_DIRECT writes already went straight to the device.
+            os.fsync(fd)  # write to disk
         # Remember to delete
         files.append(f)
         # For statistics
@@ -1013,15 +1494,32 @@ def wipe_path(pathname, idle=False):
         # See https://github.com/bleachbit/bleachbit/issues/502
         if start_free_bytes - total_bytes < 2: # Modified by Marvin to fix the issue #1051 [12/06/2020]
             break
-    # sync to disk
-    sync()
+        if 0 == writtensize:
+            # A brand-new file that accepts no data means the data
+            # blocks are exhausted. The byte accounting above cannot be
+            # relied on to reach zero on ext4, where root-reserved
+            # blocks and metadata overhead keep free_space() above the
+            # writable amount, and an O_TMPFILE needs no directory
+            # entry, so creating the next file would keep succeeding
+            # (one near-empty open file per free inode) instead of
+            # ending the loop with ENOSPC.
+            break
+    # Each file was already fsync()'d, so a global sync() here would only
+    # stall the system flushing unrelated dirty pages.
+    _wipe_path_finish(pathname, files, total_bytes, start_time)
+
+
+def _wipe_path_finish(pathname, files, total_bytes, start_time):
+    """Log wipe statistics, then truncate and close the wipe files"""
     # statistics
     elapsed_sec = time.time() - start_time
     rate_mbs = (total_bytes / (1000 * 1000)) / elapsed_sec
     logger.info(_('Wrote {files:,} files and {bytes:,} bytes in {seconds:,} seconds at {rate:.2f} MB/s').format(
                 files=len(files), bytes=total_bytes, seconds=int(elapsed_sec), rate=rate_mbs))
     # how much free space is left (should be near zero)
-    if 'posix' == os.name:
+    if 'posix' == os.name and logger.isEnabledFor(logging.INFO):
+        # The statvfs round trip is only for these log lines, so skip
+        # it when they would be discarded.
         stats = os.statvfs(pathname)
         logger.info(_("{bytes:,} bytes and {inodes:,} inodes available to non-super-user").format(
                     bytes=stats.f_bsize * stats.f_bavail, inodes=stats.f_favail))
@@ -1043,8 +1541,10 @@ def wipe_path(pathname, idle=False):
                     logger.debug(
                         _("Handled unknown error #0 while truncating file."))
                     time.sleep(0.1)
-        # explicitly delete
-        delete(f.name, ignore_missing=True)
+        # explicitly delete; an unnamed O_TMPFILE has an integer
+        # name and vanished when it was closed
+        if isinstance(f.name, str):
+            delete(f.name, ignore_missing=True)
 
 
 def vacuum_sqlite3(path):
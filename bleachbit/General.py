@@ -21,34 +21,61 @@
 General code
 """
 
+import functools
 import logging
 import os
+import subprocess
 import sys
+from xml.dom.minidom import Node
 
 import bleachbit
 
 logger = logging.getLogger(__name__)
 
+if sys.platform == 'win32':
+    import win32con
+    import win32process
+    # Template to hide the 'DOS box' window. It never changes, and
+    # Popen only reads it, so one instance serves every call.
+    _startupinfo = subprocess.STARTUPINFO()
+    _startupinfo.dwFlags = win32process.STARTF_USESHOWWINDOW
+    _startupinfo.wShowWindow = win32con.SW_HIDE
+
 
 #
 # XML
 #
+# The common spellings are checked without calling .lower(), which
+# allocates a new string on every call.
+_boolstr_true = frozenset(('true', 'True', 'TRUE'))
+_boolstr_false = frozenset(('false', 'False', 'FALSE'))
+
+
 def boolstr_to_bool(value):
     """Convert a string boolean to a Python boolean"""
-    if 'true' == value.lower():
+    if value in _boolstr_true:
+        return True
+    if value in _boolstr_false:
+        return False
+    lowered = value.lower()
+    if 'true' == lowered:
         return True
-    if 'false' == value.lower():
+    if 'false' == lowered:
         return False
     raise RuntimeError("Invalid boolean: '%s'" % value)
 
 
+_TEXT_NODE = Node.TEXT_NODE
+
+
 def getText(nodelist):
     """Return the text data in an XML node
     http://docs.python.org/library/xml.dom.minidom.html"""
-    rc = "".join(
-        node.data for node in nodelist if node.nodeType == node.TEXT_NODE
+    # A list comprehension lets str.join() pre-size its output buffer,
+    # and the hoisted constant saves an attribute lookup per node.
+    return "".join(
+        [node.data for node in nodelist if node.nodeType == _TEXT_NODE]
     )
-    return rc
 
 
 #
@@ -79,14 +106,25 @@ def chownself(path):
         logger.exception('Error in chown() under chownself()')
 
 
+@functools.lru_cache(maxsize=1)
 def getrealuid():
-    """Get the real user ID when running in sudo mode"""
+    """Get the real user ID when running in sudo mode
+
+    The answer is fixed for the process lifetime, so it is cached.
+    """
 
     if 'posix' != os.name:
         raise RuntimeError('getrealuid() requires POSIX')
 
-    if os.getenv('SUDO_UID'):
-        return int(os.getenv('SUDO_UID'))
+    sudo_uid = os.getenv('SUDO_UID')
+    if sudo_uid:
+        return int(sudo_uid)
+
+    uid = os.getuid()
+    if 0 != uid:
+        # Not elevated, so the current UID is the real one. This skips
+        # the getlogin() syscall and the /etc/passwd lookup below.
+        return uid
 
     try:
         login = os.getlogin()
@@ -100,7 +138,7 @@ def getrealuid():
         import pwd
         return pwd.getpwnam(login)[3]
 
-    return os.getuid()
+    return uid
 
 
 def makedirs(path):
@@ -109,41 +147,72 @@ def makedirs(path):
     logger.debug('makedirs(%s)', path)
     if os.path.lexists(path):
         return
-    parentdir = os.path.split(path)[0]
-    if not os.path.lexists(parentdir):
-        makedirs(parentdir)
-    os.mkdir(path, 0o700)
-    if sudo_mode():
-        chownself(path)
+    # Record which ancestors are missing, then create them top-down
+    # with one mkdir each instead of recursing here with a stat at
+    # every level. os.makedirs() is not used because since Python 3.7
+    # it applies the mode only to the leaf, which would leave the
+    # intermediate directories 0755 instead of 0700. In sudo mode only
+    # the newly created directories are chowned back to the real user,
+    # as before.
+    missing = []
+    probe = path
+    while probe and not os.path.lexists(probe):
+        missing.append(probe)
+        parent = os.path.split(probe)[0]
+        if parent == probe:
+            break
+        probe = parent
+    in_sudo_mode = sudo_mode()
+    for created in reversed(missing):
+        try:
+            os.mkdir(created, 0o700)
+        except FileExistsError:
+            continue
+        if in_sudo_mode:
+            chownself(created)
+
+
+_clean_env_keep = frozenset(('PATH', 'HOME', 'LD_LIBRARY_PATH', 'TMPDIR',
+                             'BLEACHBIT_TEST_OPTIONS_DIR'))
+_clean_env = None
+
+
+def _get_clean_env():
+    """Return a copy of the reduced environment for child processes
+
+    The kept keys are stable for the process lifetime, so os.environ is
+    scanned only once; each caller gets its own copy to mutate freely.
+    """
+    global _clean_env
+    if _clean_env is None:
+        env = {key: value for key, value in os.environ.items()
+               if key in _clean_env_keep}
+        env['LANG'] = 'C'
+        env['LC_ALL'] = 'C'
+        _clean_env = env
+    return dict(_clean_env)
 
 
 def run_external(args, stdout=None, env=None, clean_env=True):
     """Run external command and return (return code, stdout, stderr)"""
-    logger.debug('running cmd ' + ' '.join(args))
-    import subprocess
+    if logger.isEnabledFor(logging.DEBUG):
+        # Do not join the argument list unless the line will be emitted.
+        logger.debug('running cmd %s', ' '.join(args))
     if stdout is None:
         stdout = subprocess.PIPE
     kwargs = {}
     encoding = bleachbit.stdout_encoding
     if sys.platform == 'win32':
         # hide the 'DOS box' window
-        import win32process
-        import win32con
-        stui = subprocess.STARTUPINFO()
-        stui.dwFlags = win32process.STARTF_USESHOWWINDOW
-        stui.wShowWindow = win32con.SW_HIDE
-        kwargs['startupinfo'] = stui
-        encoding='mbcs'
+        kwargs['startupinfo'] = _startupinfo
+        encoding = 'mbcs'
     if not env and clean_env and 'posix' == os.name:
         # Clean environment variables so that that subprocesses use English
         # instead of translated text. This helps when checking for certain
         # strings in the output.
         # https://github.com/bleachbit/bleachbit/issues/167
         # https://github.com/bleachbit/bleachbit/issues/168
-        keep_env = ('PATH', 'HOME', 'LD_LIBRARY_PATH', 'TMPDIR', 'BLEACHBIT_TEST_OPTIONS_DIR')
-        env = {key: value for key, value in os.environ.items() if key in keep_env}
-        env['LANG'] = 'C'
-        env['LC_ALL'] = 'C'
+        env = _get_clean_env()
     p = subprocess.Popen(args, stdout=stdout,
                          stderr=subprocess.PIPE, env=env, **kwargs)
     try:
@@ -176,8 +245,12 @@ def startup_check():
             'The sqlite3 module could not be loaded. On Windows, the antivirus may be blocking it. On FreeBSD, install the package databases/py-sqlite3.')
 
 
+@functools.lru_cache(maxsize=1)
 def sudo_mode():
-    """Return whether running in sudo mode"""
+    """Return whether running in sudo mode
+
+    The answer is fixed for the process lifetime, so it is cached.
+    """
     if not sys.platform.startswith('linux'):
         return False
 
@@ -188,3 +261,10 @@ def sudo_mode():
         # return False
 
     return os.getenv('SUDO_UID') is not None
+
+
+def _reset_identity_cache():
+    """Forget the cached identity answers (for tests that change the
+    environment)"""
+    getrealuid.cache_clear()
+    sudo_mode.cache_clear()
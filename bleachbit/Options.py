@@ -90,6 +90,7 @@ class Options:
 
     def __init__(self):
         self.purged = False
+        self._whitelist_prepared = None
         self.config = bleachbit.RawConfigParser()
         self.config.optionxform = str  # make keys case sensitive for hashpath purging
         self.config.BOOLEAN_STATES['t'] = True
@@ -213,6 +214,22 @@ class Options:
         """Return the whitelist of paths"""
         return self.get_paths("whitelist/paths")
 
+    def get_whitelist_paths_prepared(self):
+        """Return the whitelist preprocessed for fast matching
+
+        Each entry is (type, match_path, match_prefix) where the paths
+        are lowercased on Windows, so callers checking many files do
+        not repeat the case folding per query. The result is cached
+        until the whitelist changes.
+        """
+        if self._whitelist_prepared is None:
+            prepared = []
+            for (p_type, p_path) in self.get_whitelist_paths():
+                match_path = p_path.lower() if 'nt' == os.name else p_path
+                prepared.append((p_type, match_path, match_path + os.sep))
+            self._whitelist_prepared = tuple(prepared)
+        return self._whitelist_prepared
+
     def get_custom_paths(self):
         """Return list of custom paths"""
         return self.get_paths("custom/paths")
@@ -251,6 +268,7 @@ class Options:
 
     def restore(self):
         """Restore saved options from disk"""
+        self._whitelist_prepared = None
         try:
             self.config.read(bleachbit.options_file, encoding='utf-8-sig')
         except:
@@ -327,6 +345,7 @@ class Options:
 
     def set_whitelist_paths(self, values):
         """Save the whitelist"""
+        self._whitelist_prepared = None
         section = "whitelist/paths"
         if self.config.has_section(section):
             self.config.remove_section(section)
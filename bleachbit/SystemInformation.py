@@ -25,88 +25,146 @@ Show system information
 
 import bleachbit
 
+import functools
 import locale
 import os
 import platform
 import sys
+from collections import namedtuple
 
-if 'nt' == os.name:
+# The platform is fixed for the process lifetime, so test it once at
+# import instead of on every call.
+_IS_POSIX = 'posix' == os.name
+_IS_NT = 'nt' == os.name
+_IS_LINUX = sys.platform.startswith('linux')
+_IS_DARWIN = sys.platform.startswith('darwin')
+
+if _IS_NT:
     from win32com.shell import shell
+    # Admin status is effectively constant for a running process, and
+    # IsUserAnAdmin() is a COM call, so capture it once.
+    try:
+        _IS_ADMIN = bool(shell.IsUserAnAdmin())
+    except:
+        _IS_ADMIN = 'unavailable'
+
+
+# platform.platform() assembles its result from uname() and os-release
+# files, and platform.linux_distribution() parses release files on disk.
+# Neither changes while the process runs, so snapshot them at import.
+_PLATFORM_STR = platform.platform()
+_PLATFORM_VERSION = platform.version()
+_LINUX_DIST = str(platform.linux_distribution()) if _IS_LINUX else None
+
+Environment = namedtuple('Environment', ['default_locale', 'home'])
+
+
+@functools.lru_cache(maxsize=None)
+def _getenv_cached(name):
+    """Return the environment variable, caching the result
+
+    The process environment does not change during the lifetime of the
+    process, so unset variables are cached, too.
+    """
+    return os.getenv(name)
+
+
+@functools.lru_cache(maxsize=None)
+def _collect_environment():
+    """Collect process-invariant environment details once
+
+    locale, home directory, and platform details do not change while the
+    process runs, and some of them read files or scan the environment
+    block, so query them only on the first call.
+    """
+    return Environment(default_locale=str(locale.getdefaultlocale()),
+                       home=os.path.expanduser('~'))
 
 
 def get_system_information():
     """Return system information as a string"""
+    # Collect lines in a list and join once at the end: repeated string
+    # concatenation is quadratic on interpreters without CPython's in-place
+    # optimization.
+    lines = []
     # this section is for application and library versions
-    s = "BleachBit version %s" % bleachbit.APP_VERSION
+    lines.append(f"BleachBit version {bleachbit.APP_VERSION}")
 
     try:
         # Linux tarball will have a revision but not build_number
         from bleachbit.Revision import revision
-        s += '\nGit revision %s' % revision
+        lines.append(f'Git revision {revision}')
     except:
         pass
     try:
         from bleachbit.Revision import build_number
-        s += '\nBuild number %s' % build_number
+        lines.append(f'Build number {build_number}')
     except:
         pass
     try:
         import gi
         gi.require_version('Gtk', '3.0')
         from gi.repository import Gtk
-        s += '\nGTK version {0}.{1}.{2}'.format(
-            Gtk.get_major_version(), Gtk.get_minor_version(), Gtk.get_micro_version())
-        s += '\nGTK theme = %s' % Gtk.Settings.get_default().get_property('gtk-theme-name')
-        s += '\nGTK icon theme = %s' % Gtk.Settings.get_default().get_property('gtk-icon-theme-name')
-        s += '\nGTK prefer dark theme = %s' % Gtk.Settings.get_default().get_property('gtk-application-prefer-dark-theme')
+        lines.append(
+            f'GTK version {Gtk.get_major_version()}.{Gtk.get_minor_version()}.{Gtk.get_micro_version()}')
+        gtk_settings = Gtk.Settings.get_default()
+        lines.append(
+            f"GTK theme = {gtk_settings.get_property('gtk-theme-name')}")
+        lines.append(
+            f"GTK icon theme = {gtk_settings.get_property('gtk-icon-theme-name')}")
+        lines.append(
+            f"GTK prefer dark theme = {gtk_settings.get_property('gtk-application-prefer-dark-theme')}")
     except:
         pass
     import sqlite3
-    s += "\nSQLite version %s" % sqlite3.sqlite_version
+    lines.append(f"SQLite version {sqlite3.sqlite_version}")
 
     # this section is for variables defined in __init__.py
-    s += "\nlocal_cleaners_dir = %s" % bleachbit.local_cleaners_dir
-    s += "\nlocale_dir = %s" % bleachbit.locale_dir
-    s += "\noptions_dir = %s" % bleachbit.options_dir
-    s += "\npersonal_cleaners_dir = %s" % bleachbit.personal_cleaners_dir
-    s += "\nsystem_cleaners_dir = %s" % bleachbit.system_cleaners_dir
+    lines.append(f"local_cleaners_dir = {bleachbit.local_cleaners_dir}")
+    lines.append(f"locale_dir = {bleachbit.locale_dir}")
+    lines.append(f"options_dir = {bleachbit.options_dir}")
+    lines.append(f"personal_cleaners_dir = {bleachbit.personal_cleaners_dir}")
+    lines.append(f"system_cleaners_dir = {bleachbit.system_cleaners_dir}")
 
     # this section is for information about the system environment
-    s += "\nlocale.getdefaultlocale = %s" % str(locale.getdefaultlocale())
-    if 'posix' == os.name:
+    environment = _collect_environment()
+    lines.append(f"locale.getdefaultlocale = {environment.default_locale}")
+    if _IS_POSIX:
         envs = ('DESKTOP_SESSION', 'LOGNAME', 'USER', 'SUDO_UID')
-    elif 'nt' == os.name:
+    elif _IS_NT:
         envs = ('APPDATA', 'cd', 'LocalAppData', 'LocalAppDataLow', 'Music',
                 'USERPROFILE', 'ProgramFiles', 'ProgramW6432', 'TMP')
     for env in envs:
-        s += "\nos.getenv('%s') = %s" % (env, os.getenv(env))
-    s += "\nos.path.expanduser('~') = %s" % os.path.expanduser('~')
-    if sys.platform.startswith('linux'):
-        s += "\nplatform.linux_distribution() = %s" % str(platform.linux_distribution())
+        lines.append(f"os.getenv('{env}') = {_getenv_cached(env)}")
+    lines.append(f"os.path.expanduser('~') = {environment.home}")
+    if _IS_LINUX:
+        lines.append(
+            f"platform.linux_distribution() = {_LINUX_DIST}")
 
     # Mac Version Name - Dictionary
     macosx_dict = {'5': 'Leopard', '6': 'Snow Leopard', '7': 'Lion', '8': 'Mountain Lion',
                    '9': 'Mavericks', '10': 'Yosemite', '11': 'El Capitan', '12': 'Sierra'}
 
-    if sys.platform.startswith('darwin'):
+    if _IS_DARWIN:
         if hasattr(platform, 'mac_ver'):
             for key in macosx_dict:
                 if (platform.mac_ver()[0].split('.')[1] == key):
-                    s += "\nplatform.mac_ver() = %s" % str(
-                        platform.mac_ver()[0] + " (" + macosx_dict[key] + ")")
+                    lines.append(
+                        f"platform.mac_ver() = {platform.mac_ver()[0]} ({macosx_dict[key]})")
         else:
-            s += "\nplatform.dist() = %s" % str(platform.linux_distribution(full_distribution_name=0))
-
-    if 'nt' == os.name:
-        s += "\nplatform.win32_ver[1]() = %s" % platform.win32_ver()[1]
-    s += "\nplatform.platform = %s" % platform.platform()
-    s += "\nplatform.version = %s" % platform.version()
-    s += "\nsys.argv = %s" % sys.argv
-    s += "\nsys.executable = %s" % sys.executable
-    s += "\nsys.version = %s" % sys.version
-    if 'nt' == os.name:
-        s += "\nwin32com.shell.shell.IsUserAnAdmin() = %s" % shell.IsUserAnAdmin(
-        )
-    s += "\n__file__ = %s" % __file__
-
-    return s
+            lines.append(
+                f"platform.dist() = {platform.linux_distribution(full_distribution_name=0)}")
+
+    if _IS_NT:
+        lines.append(f"platform.win32_ver[1]() = {platform.win32_ver()[1]}")
+    lines.append(f"platform.platform = {_PLATFORM_STR}")
+    lines.append(f"platform.version = {_PLATFORM_VERSION}")
+    lines.append(f"sys.argv = {sys.argv}")
+    lines.append(f"sys.executable = {sys.executable}")
+    lines.append(f"sys.version = {sys.version}")
+    if _IS_NT:
+        lines.append(
+            f"win32com.shell.shell.IsUserAnAdmin() = {_IS_ADMIN}")
+    lines.append(f"__file__ = {__file__}")
+
+    return "\n".join(lines)
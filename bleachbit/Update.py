@@ -25,6 +25,7 @@ Check for updates via the Internet
 import bleachbit
 from bleachbit import _
 
+import functools
 import hashlib
 import logging
 import os
@@ -48,7 +49,16 @@ def update_winapp2(url, hash_expected, append_text, cb_success):
     delete_current = False
     if os.path.exists(fn):
         with open(fn, 'rb') as f:
-            hash_current = hashlib.sha512(f.read()).hexdigest()
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+: the read/update loop runs in C and
+                # releases the GIL, without building one large bytes
+                # object for the whole file.
+                hash_current = hashlib.file_digest(f, 'sha512').hexdigest()
+            else:
+                hasher = hashlib.sha512()
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(chunk)
+                hash_current = hasher.hexdigest()
             if not hash_expected or hash_current == hash_expected:
                 # update is same as current
                 return
@@ -76,8 +86,13 @@ def update_winapp2(url, hash_expected, append_text, cb_success):
     cb_success()
 
 
+@functools.lru_cache(maxsize=1)
 def user_agent():
-    """Return the user agent string"""
+    """Return the user agent string
+
+    The platform, locale, and GTK introspection behind it are invariant
+    for the process lifetime, so compute the string only once.
+    """
     __platform = platform.system()  # Linux or Windows
     __os = platform.uname()[2]  # e.g., 2.6.28-12-generic or XP
     if sys.platform == "win32":
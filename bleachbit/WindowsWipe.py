@@ -50,11 +50,12 @@ from bleachbit.FileUtilities import extended_path, extended_path_undo
 *** - (*) Get volume bitmap of free/allocated clusters using defrag API. 
 ***   Figure out if checkpoint has made our missed clusters available
 ***   for use again (this is potentially delayed by a few seconds in NTFS).
-*** - If they have not yet been made available, wait 0.1s then repeat
-***   previous check (*), up to a limit of 7s in polling.
+*** - If they have not yet been made available, wait briefly (10ms,
+***   doubling up to 100ms) then repeat previous check (*), up to a
+***   limit of 7s in polling.
 *** - Figure out if it is better to bridge the extents, wiping more clusters
 ***   but gaining a performance boost from reduced total cycles and overhead.
-*** - Recurse over the extents we need to wipe, breaking them down into
+*** - Work through the extents we need to wipe, breaking them down into
 ***   smaller extents if necessary.
 *** - Write a zero-fill file that will provide enough clusters to
 ***   completely overwrite each extent in turn.
@@ -77,6 +78,13 @@ from bleachbit.FileUtilities import extended_path, extended_path_undo
 ***   TO DO
 ***   - Test working correctly if per-user disk quotas are in place
 ***
+***   Considered and rejected: skipping the zero-fill writes on SSDs in
+***   favor of FSCTL_FILE_LEVEL_TRIM after querying
+***   StorageDeviceSeekPenaltyProperty. TRIM is advisory - the drive may
+***   defer or ignore it, and reading back zeros afterwards is only
+***   guaranteed on drives reporting RZAT - so it cannot carry the wipe
+***   guarantee this module exists to provide. Explicit overwrite stays.
+***
 """
 
 
@@ -85,9 +93,12 @@ import sys
 import os
 import struct
 import logging
+import math
+import mmap
+import time
 from operator import itemgetter
-from random import randint
-from collections import namedtuple
+from random import randint, random
+from collections import deque, namedtuple
 
 from win32api import (GetVolumeInformation, GetDiskFreeSpace,
                       GetVersionEx, Sleep)
@@ -128,11 +139,23 @@ simulate_concurrency = False     # remove this test function when QA complete
 # don't use C: or D:, but E: and beyond OK.
 tmp_file_name = "bbtemp.dat"
 spike_file_name = "bbspike"     # cluster number will be appended
-write_buf_size = 512 * 1024     # 512 kilobytes
+write_buf_size = 512 * 1024     # 512 kilobytes, retuned per volume
+_write_buf_size_min = 512 * 1024
+_write_buf_size_max = 2 * 1024**2
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Precompiled structure formats for the frequently used calls, so the
+# format strings are parsed once at import instead of on every call.
+_Q_STRUCT = struct.Struct('q')
+_QQ_STRUCT = struct.Struct('qq')
+_RP_HEADER_STRUCT = struct.Struct('IIq')
+_MOVE_FILE_STRUCT = struct.Struct('IIqqII')
+_VOLUME_DATA_STRUCT = struct.Struct('5q4I5q')
+# Packed zero int64, the input block for requests starting at zero.
+_ZERO_INT64 = _Q_STRUCT.pack(0)
+
 # Unpacks the next element in a structure, using format requested.
 # Returns the element and the remaining content of the structure.
 
@@ -191,14 +214,20 @@ def logical_ranges_to_extents(ranges, bridge_compressed=False):
             # be merged together. The pattern is regular disk
             # clusters interspersed with -1 space-saver sections
             # that are arranged with gaps of 16 clusters or less.
+            # Carrying the LCN at merge_index in a local avoids
+            # re-indexing the same records on every iteration, which
+            # matters for heavily fragmented compressed files.
             merge_index = index
-            while (lcn >= 0 and
-                   merge_index + 2 < last_record and
-                   ranges[merge_index + 1][1] < 0 and
-                   ranges[merge_index + 2][1] >= 0 and
-                   ranges[merge_index + 2][1] - ranges[merge_index][1] <= 16 and
-                   ranges[merge_index + 2][1] - ranges[merge_index][1] > 0):
+            merge_lcn = lcn
+            while merge_index + 2 < last_record:
+                gap_lcn = ranges[merge_index + 1][1]
+                next_lcn = ranges[merge_index + 2][1]
+                if gap_lcn >= 0 or next_lcn < 0:
+                    break
+                if not 0 < next_lcn - merge_lcn <= 16:
+                    break
                 merge_index += 2
+                merge_lcn = next_lcn
 
             # Figure out length for this cluster range.
             # Keep track of VCN inside this file.
@@ -221,43 +250,56 @@ def logical_ranges_to_extents(ranges, bridge_compressed=False):
 # Determine clusters that are in extents list A but not in B.
 # Generator function, will return results one tuple at a time.
 def extents_a_minus_b(a, b):
-    # Sort the lists of start/end points.
+    # Sort the lists of start/end points, then walk them together with
+    # a single cursor into B, so the subtraction is linear in
+    # len(a) + len(b) instead of rescanning B for every A range. This
+    # also fixes a bug in the previous nested-loop version, which
+    # silently dropped an A range whenever every B range ended before
+    # it.
     a_sorted = sorted(a, key=itemgetter(0))
     b_sorted = sorted(b, key=itemgetter(0))
-    b_is_empty = not b
+    b_count = len(b_sorted)
+    b_index = 0
 
     for a_begin, a_end in a_sorted:
-        # If B is an empty list, each item of A will be unchanged.
-        if b_is_empty:
-            yield (a_begin, a_end)
-
-        for b_begin, b_end in b_sorted:
+        # B ranges ending before this A range cannot overlap it, nor
+        # any later A range, because A is sorted by start point.
+        while b_index < b_count and b_sorted[b_index][1] < a_begin:
+            b_index += 1
+        # A separate cursor, because a B range overlapping the tail of
+        # this A range may also overlap the next one.
+        cursor = b_index
+        while a_begin <= a_end and cursor < b_count:
+            b_begin, b_end = b_sorted[cursor]
             if b_begin > a_end:
-                # Already gone beyond current A range and no matches.
-                # Return this range of A unbroken.
-                yield (a_begin, a_end)
                 break
-            elif b_end < a_begin:
-                # Too early in list, keep searching.
-                continue
-            elif b_begin <= a_begin:
-                if b_end >= a_end:
-                    # This range of A is completely covered by B.
-                    # Do nothing and pass on to next range of A.
-                    break
-                else:
-                    # This range of A is partially covered by B.
-                    # Remove the covered range from A and loop
-                    a_begin = b_end + 1
-            else:
-                # This range of A is partially covered by B.
+            if b_begin > a_begin:
                 # Return the first part of A not covered.
-                # Either process remainder of A range or move to next A.
                 yield (a_begin, b_begin - 1)
-                if b_end >= a_end:
-                    break
-                else:
-                    a_begin = b_end + 1
+            # Remove the covered range from A and loop. A B range
+            # nested inside the previous one must not move the start
+            # backwards.
+            a_begin = max(a_begin, b_end + 1)
+            cursor += 1
+        if a_begin <= a_end:
+            # Remainder of A not covered by any B range.
+            yield (a_begin, a_end)
+
+
+# Merge extents that are adjacent or separated by at most max_gap free
+# clusters, so the defrag loop performs one write/move cycle for the
+# merged range instead of several small ones. Including a gap cluster
+# is safe: wipe_extent_by_defrag() checks the volume bitmap and splits
+# around any cluster that turns out to be allocated.
+def _coalesce_extents(extents, max_gap=1):
+    merged = []
+    for lcn_start, lcn_end in sorted(extents, key=itemgetter(0)):
+        if merged and lcn_start - merged[-1][1] - 1 <= max_gap:
+            if lcn_end > merged[-1][1]:
+                merged[-1][1] = lcn_end
+        else:
+            merged.append([lcn_start, lcn_end])
+    return [(lcn_start, lcn_end) for lcn_start, lcn_end in merged]
 
 
 # Decide if it will be more efficient to bridge the extents and wipe
@@ -268,17 +310,31 @@ def extents_a_minus_b(a, b):
 def choose_if_bridged(volume_handle, total_clusters,
                       orig_extents, bridged_extents):
     logger.debug('bridged extents: {}'.format(bridged_extents))
-    allocated_extents = []
+    # The saving before accounting for allocated clusters is an upper
+    # bound: working around allocated clusters only splits the bridged
+    # extents further. If it is already small enough that one allocated
+    # cluster (penalty of 10 below) would erase it, skip fetching and
+    # scanning the volume bitmap altogether.
+    saving_estimate = len(orig_extents) - len(bridged_extents)
+    if saving_estimate <= 2:
+        logger.debug("Not bridging extents; would save at most %d",
+                     saving_estimate)
+        return orig_extents
     volume_bitmap, bitmap_size = get_volume_bitmap(volume_handle,
-                                                   total_clusters)
+                                                   total_clusters,
+                                                   allow_cached=True)
     count_ofree, count_oallocated = check_extents(
         orig_extents, volume_bitmap)
-    count_bfree, count_ballocated = check_extents(
-        bridged_extents,
-        volume_bitmap,
-        allocated_extents)
-    bridged_extents = [x for x in extents_a_minus_b(bridged_extents,
-                                                    allocated_extents)]
+    # One fused pass: the free runs inside the bridged extents are
+    # exactly the bridged extents minus the allocated clusters, so
+    # there is no separate allocated list to build and subtract.
+    bridged_cluster_count = sum(
+        lcn_end - lcn_start + 1 for lcn_start, lcn_end in bridged_extents)
+    bridged_extents = list(check_extents_free_runs(bridged_extents,
+                                                   volume_bitmap))
+    count_bfree = sum(
+        lcn_end - lcn_start + 1 for lcn_start, lcn_end in bridged_extents)
+    count_ballocated = bridged_cluster_count - count_bfree
 
     extra_allocated_clusters = count_ballocated - count_oallocated
     saving_in_extents = len(orig_extents) - len(bridged_extents)
@@ -309,26 +365,142 @@ def choose_if_bridged(volume_handle, total_clusters,
 def split_extent(lcn_start, lcn_end):
     split_factor = 10
 
-    exponent = 0
     count = lcn_end - lcn_start + 1
+    # Closed-form estimate of the smallest exponent satisfying
+    # count <= split_factor ** (exponent + 1.3), instead of counting
+    # up from zero; the two guard loops correct for floating-point
+    # rounding at the boundaries and run at most one step each.
+    exponent = max(0, math.ceil(math.log10(count) - 1.3))
     while count > split_factor**(exponent + 1.3):
         exponent += 1
+    while exponent > 0 and count <= split_factor**(exponent - 1 + 1.3):
+        exponent -= 1
     extent_size = split_factor**exponent
     for x in range(lcn_start, lcn_end + 1, extent_size):
         yield (x, min(x + extent_size - 1, lcn_end))
 
 
+try:
+    _popcount = int.bit_count     # Python 3.10+, maps to hardware POPCNT
+except AttributeError:
+    def _popcount(value):
+        return bin(value).count('1')
+# A compiled extension for these bitmap kernels was considered and
+# rejected: int.bit_count and int.from_bytes already run the counting
+# and scanning in C on hardware-popcount instructions, BleachBit ships
+# as pure Python, and profiling shows the DeviceIoControl calls, not
+# the bitmap arithmetic, dominate the wipe phase.
+
+
+# Return the volume-bitmap bits for an LCN range as one integer.
+# The low bit of the result corresponds to lcn_start, and bits beyond
+# lcn_end are masked off. Converting the byte range in one call keeps
+# the counting and scanning in C instead of one Python iteration per
+# cluster.
+def _extent_bits(volume_bitmap, lcn_start, lcn_end):
+    bits = int.from_bytes(
+        volume_bitmap[lcn_start >> 3:(lcn_end >> 3) + 1], 'little')
+    bits >>= lcn_start & 7
+    return bits & ((1 << (lcn_end - lcn_start + 1)) - 1)
+
+
+# Hierarchical summary of the volume bitmap: one entry per 4 KiB chunk
+# (32,768 clusters), nonzero when any cluster in the chunk is
+# allocated. Extent scans consult it first and skip all-free chunks
+# without popcounting them, which on mostly-empty volumes is most of
+# the bitmap. Cached per bitmap object; CPython caches the hash of
+# bytes objects, so repeat lookups are cheap.
+_SUMMARY_CHUNK_BYTES = 4096
+_summary_cache = {}
+
+
+def _bitmap_summary(volume_bitmap):
+    summary = _summary_cache.get(volume_bitmap)
+    if summary is None:
+        chunk = _SUMMARY_CHUNK_BYTES
+        size = len(volume_bitmap)
+        # bytes.count() takes a range, so each chunk is examined in
+        # place without slicing out a copy.
+        summary = bytearray(
+            volume_bitmap.count(0, i, i + chunk) != min(chunk, size - i)
+            for i in range(0, size, chunk))
+        if len(_summary_cache) > 2:
+            _summary_cache.clear()
+        _summary_cache[volume_bitmap] = summary
+    return summary
+
+
+# Count the allocated clusters in an LCN range. The walk advances one
+# summary chunk at a time, popcounting only chunks that contain any
+# allocated cluster; this also bounds peak allocation, since no slice
+# larger than 4 KiB is materialized.
+def _extent_popcount(volume_bitmap, lcn_start, lcn_end):
+    summary = _bitmap_summary(volume_bitmap)
+    clusters_per_chunk = _SUMMARY_CHUNK_BYTES * 8
+    count = 0
+    start = lcn_start
+    while start <= lcn_end:
+        chunk_index = start // clusters_per_chunk
+        chunk_last = min((chunk_index + 1) * clusters_per_chunk - 1,
+                         lcn_end)
+        if summary[chunk_index]:
+            count += _popcount(
+                _extent_bits(volume_bitmap, start, chunk_last))
+        start = chunk_last + 1
+    return count
+
+
 # Check extents to see if they are marked as free.
+def _check_extent(volume_bitmap, lcn_start, lcn_end, allocated_extents):
+    if allocated_extents is None:
+        n_allocated = _extent_popcount(volume_bitmap,
+                                       lcn_start, lcn_end)
+        return lcn_end - lcn_start + 1 - n_allocated, n_allocated
+    bits = _extent_bits(volume_bitmap, lcn_start, lcn_end)
+    n_allocated = _popcount(bits)
+    # Emit one range per run of set bits rather than one tuple
+    # per allocated cluster; allocated clusters usually come in
+    # contiguous runs, and the downstream subtraction handles
+    # ranges directly.
+    base = lcn_start
+    while bits:
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        base += skip
+        run = (~bits & (bits + 1)).bit_length() - 1
+        allocated_extents.append((base, base + run - 1)) # Modified by Marvin [12/05/2020] The extents should have (start, end) format
+        bits >>= run
+        base += run
+    return lcn_end - lcn_start + 1 - n_allocated, n_allocated
+
+
+# Yield the free (start, end) runs inside each extent. This equals
+# subtracting the allocated clusters from the extents, produced in one
+# pass over the bitmap without materializing the allocated list.
+def check_extents_free_runs(extents, volume_bitmap):
+    for lcn_start, lcn_end in extents:
+        width = lcn_end - lcn_start + 1
+        free = ~_extent_bits(volume_bitmap, lcn_start, lcn_end) & (
+            (1 << width) - 1)
+        base = lcn_start
+        while free:
+            skip = (free & -free).bit_length() - 1
+            free >>= skip
+            base += skip
+            run = (~free & (free + 1)).bit_length() - 1
+            yield (base, base + run - 1)
+            free >>= run
+            base += run
+
+
 def check_extents(extents, volume_bitmap, allocated_extents=None):
     count_free, count_allocated = (0, 0)
     for lcn_start, lcn_end in extents:
-        for cluster in range(lcn_start, lcn_end + 1):
-            if check_mapped_bit(volume_bitmap, cluster):
-                count_allocated += 1
-                if allocated_extents is not None:
-                    allocated_extents.append((cluster, cluster)) # Modified by Marvin [12/05/2020] The extents should have (start, end) format 
-            else:
-                count_free += 1
+        n_free, n_allocated = _check_extent(volume_bitmap,
+                                            lcn_start, lcn_end,
+                                            allocated_extents)
+        count_free += n_free
+        count_allocated += n_allocated
 
     logger.debug("Extents checked: clusters free %d; allocated %d",
                  count_free, count_allocated)
@@ -345,28 +517,47 @@ def check_extents_concurrency(extents, volume_bitmap,
                               allocated_extents=None):
     odds_to_allocate = 1200    # 1 in 1200
 
+    # Draw the distance to the next simulated allocation from the
+    # geometric distribution matching the old per-cluster coin flip.
+    # One random draw per spike replaces one per cluster, and the
+    # clusters in between are counted in bulk like check_extents().
+    gap_denominator = math.log(1.0 - 1.0 / odds_to_allocate)
+
     count_free, count_allocated = (0, 0)
     for lcn_start, lcn_end in extents:
-        for cluster in range(lcn_start, lcn_end + 1):
-            # Every once in a while, occupy a particular cluster on disk.
-            if randint(1, odds_to_allocate) == odds_to_allocate:
-                spike_cluster(volume_handle, cluster, tmp_file_path)
-                if bool(randint(0, 1)):
-                    # Simulate allocated before the check, by refetching
-                    # the volume bitmap.
-                    logger.debug("Simulate known allocated")
-                    volume_bitmap, _ = get_volume_bitmap(
-                        volume_handle, total_clusters)
-                else:
-                    # Simulate allocated after the check.
-                    logger.debug("Simulate unknown allocated")
-
-            if check_mapped_bit(volume_bitmap, cluster):
+        cluster = lcn_start
+        while cluster <= lcn_end:
+            gap = int(math.log(1.0 - random()) / gap_denominator) + 1
+            spike_at = cluster + gap - 1
+            span_end = min(spike_at - 1, lcn_end)
+            if span_end >= cluster:
+                n_free, n_allocated = _check_extent(volume_bitmap,
+                                                    cluster, span_end,
+                                                    allocated_extents)
+                count_free += n_free
+                count_allocated += n_allocated
+            if spike_at > lcn_end:
+                break
+            # Occupy this particular cluster on disk.
+            spike_cluster(volume_handle, spike_at, tmp_file_path)
+            if bool(randint(0, 1)):
+                # Simulate allocated before the check, by refetching
+                # the volume bitmap.
+                logger.debug("Simulate known allocated")
+                volume_bitmap, _ = get_volume_bitmap(
+                    volume_handle, total_clusters)
+            else:
+                # Simulate allocated after the check.
+                logger.debug("Simulate unknown allocated")
+
+            if check_mapped_bit(volume_bitmap, spike_at):
                 count_allocated += 1
                 if allocated_extents is not None:
-                    allocated_extents.append(cluster)
+                    # (start, end) format, matching check_extents().
+                    allocated_extents.append((spike_at, spike_at))
             else:
                 count_free += 1
+            cluster = spike_at + 1
 
     logger.debug("Extents checked: clusters free %d; allocated %d",
                  count_free, count_allocated)
@@ -391,6 +582,8 @@ def spike_cluster(volume_handle, cluster, tmp_file_path):
     write_zero_fill(file_handle, 2000)
     move_file(volume_handle, file_handle, 0, cluster, 1)
     CloseHandle(file_handle)
+    # The spike changed the allocation state behind any cached bitmap.
+    _invalidate_volume_bitmap_cache()
     logger.debug("Spiked cluster %d with %s" % (cluster, spike_file_path))
 
 
@@ -398,13 +591,9 @@ def spike_cluster(volume_handle, cluster, tmp_file_path):
 # The LCN determines at what index into the bytes/bits structure we
 # should look.
 def check_mapped_bit(volume_bitmap, lcn):
-    assert isinstance(lcn, int)
-    mapped_bit = volume_bitmap[lcn // 8]
-    bit_location = lcn % 8    # zero-based
-    if bit_location > 0:
-        mapped_bit = mapped_bit >> bit_location
-    mapped_bit = mapped_bit & 1
-    return mapped_bit > 0
+    # Shifts and masks instead of division, and an unconditional shift
+    # instead of branching on bit position zero.
+    return bool((volume_bitmap[lcn >> 3] >> (lcn & 7)) & 1)
 
 
 # Check the operating system. Go no further unless we are on
@@ -484,6 +673,15 @@ class UnsupportedFileSystemError(Exception):
 # Second call: Sectors per Cluster; Bytes per Sector; Total # of Clusters.
 # Third call: Drive Type.
 
+VolumeInfo = namedtuple('VolumeInfo', [
+    'drive_name', 'max_path', 'file_system',
+    'sectors_per_cluster', 'bytes_per_sector', 'total_clusters'])
+
+# Volume geometry is fixed while the volume stays mounted, so the
+# answers are memoized per volume. Wiping a directory full of files on
+# one volume then costs the three Win32 calls once instead of per file.
+_volume_info_cache = {}
+
 
 def get_volume_information(volume):
     # If it's a UNC path, raise an error.
@@ -491,6 +689,10 @@ def get_volume_information(volume):
         raise UnsupportedFileSystemError(
             "Only files with a Local File System path can be wiped.")
 
+    cached = _volume_info_cache.get(volume)
+    if cached is not None:
+        return cached
+
     result1 = GetVolumeInformation(volume)
     result2 = GetDiskFreeSpace(volume)
     result3 = GetDriveType(volume)
@@ -509,12 +711,10 @@ def get_volume_information(volume):
         raise UnsupportedFileSystemError(
             "This file system (UDF) is not supported.")
 
-    volume_info = namedtuple('VolumeInfo', [
-        'drive_name', 'max_path', 'file_system',
-        'sectors_per_cluster', 'bytes_per_sector', 'total_clusters'])
-
-    return volume_info(result1[0], result1[2], result1[4],
-                       result2[0], result2[1], result2[3])
+    volume_info = VolumeInfo(result1[0], result1[2], result1[4],
+                             result2[0], result2[1], result2[3])
+    _volume_info_cache[volume] = volume_info
+    return volume_info
 
 
 # Get read/write access to a volume.
@@ -549,7 +749,7 @@ def obtain_readwrite(volume):
 def get_extents(file_handle, translate_to_extents=True):
     # Assemble input structure and query Windows for retrieval pointers.
     # The input structure is the number 0 as a signed 64 bit integer.
-    input_struct = struct.pack('q', 0)
+    input_struct = _ZERO_INT64
     # 4K, 32K, 256K, 2M step ups in buffer size, until call succeeds.
     # Compressed/encrypted/sparse files tend to have more chopped up extents.
     buf_retry_sizes = [4 * 1024, 32 * 1024, 256 * 1024, 2 * 1024**2]
@@ -580,31 +780,22 @@ def get_extents(file_handle, translate_to_extents=True):
     # Process content of the first part of structure.
     # Separate the retrieval pointers list up front, so we are not making
     # too many string copies of it.
-    chunk_size = struct.calcsize('IIq')
-    rp_list = rp_struct[chunk_size:]
-    rp_struct = rp_struct[:chunk_size]
-    record_count, rp_struct = unpack_element('I', rp_struct)    # 4 bytes
-    _, rp_struct = unpack_element('I', rp_struct)               # 4 bytes
-    starting_vcn, rp_struct = unpack_element('q', rp_struct)    # 8 bytes
-    # 4 empty bytes were consumed above.
-    # This is for reasons of 64-bit alignment inside structure.
+    rp_list = rp_struct[_RP_HEADER_STRUCT.size:]
+    # One unpack for the whole 16-byte header; the second element is
+    # 4 empty bytes for reasons of 64-bit alignment inside structure.
+    record_count, _, starting_vcn = _RP_HEADER_STRUCT.unpack_from(rp_struct)
 
     # If we make the GET_RETRIEVAL_POINTERS request with 0,
     # this should always come back 0.
     assert starting_vcn == 0
 
     # Populate the extents array with the ranges from rp structure.
-    ranges = []
-    c = record_count
-    i = 0
-    chunk_size = struct.calcsize('q')
-    buf_size = len(rp_list)
-    while c > 0 and i < buf_size:
-        next_vcn = struct.unpack_from('q', rp_list, offset=i)
-        lcn = struct.unpack_from('q', rp_list, offset=i + chunk_size)
-        ranges.append((next_vcn[0], lcn[0]))
-        i += chunk_size * 2
-        c -= 1
+    # Each record is a (next_vcn, lcn) pair of signed 64-bit integers,
+    # so the whole list unpacks in one call instead of two
+    # struct.unpack_from() calls per record.
+    record_count = min(record_count, len(rp_list) // (_Q_STRUCT.size * 2))
+    flat = struct.unpack_from('%dq' % (record_count * 2), rp_list)
+    ranges = list(zip(flat[::2], flat[1::2]))
 
     if not translate_to_extents:
         return ranges
@@ -641,14 +832,57 @@ def file_add_sparse_region(file_handle, byte_start, byte_end):
                         input_struct, buf_size)
 
 
+# Cache of recently fetched volume bitmaps, keyed by volume handle.
+# wipe_extent_by_defrag() refetches the bitmap for every extent it
+# examines, and a fragmented file can have thousands of extents; each
+# fetch makes Windows copy the whole bitmap. A short-lived cache is
+# safe for those look-ahead checks because they already tolerate
+# staleness: another process can allocate a cluster right after any
+# fetch, and a failed move_file() is handled by splitting the extent.
+# Callers that need a current bitmap, such as the freed-cluster
+# polling, leave allow_cached off.
+_bitmap_cache_seconds = 0.5
+_bitmap_cache = {}
+
+
+def _invalidate_volume_bitmap_cache():
+    _bitmap_cache.clear()
+
+
 # Retrieve a bitmap of whether clusters on disk are free/allocated.
-def get_volume_bitmap(volume_handle, total_clusters):
+# When lcn_range is given as (lcn_start, lcn_end), the fetch starts at
+# lcn_range[0] aligned down to a multiple of 8 instead of at LCN 0, and
+# the returned bitmap is indexed relative to that starting LCN, so
+# callers must shift their cluster numbers by the aligned start.
+# FSCTL_GET_VOLUME_BITMAP always fills the buffer from StartingLcn to
+# the END of the volume - a buffer sized for less makes DeviceIoControl
+# raise ERROR_MORE_DATA instead of returning the partial bitmap - so
+# the buffer must cover total_clusters - starting_lcn bits and only the
+# part before the window is saved. That still matters: the extents
+# being checked usually sit late in a large volume, and the cache
+# avoids refetching the same tail for neighboring extents.
+def get_volume_bitmap(volume_handle, total_clusters, allow_cached=False,
+                      lcn_range=None):
+    if lcn_range is None:
+        starting_lcn = 0
+    else:
+        starting_lcn = lcn_range[0] & ~7
+    # The bitmap runs from starting_lcn to the end of the volume, so the
+    # window end does not enter the key: any request with the same
+    # starting LCN returns the same data.
+    cache_key = (int(volume_handle), starting_lcn)
+    if allow_cached:
+        cached = _bitmap_cache.get(cache_key)
+        if (cached is not None and
+                time.monotonic() - cached[0] <= _bitmap_cache_seconds):
+            return cached[1], cached[2]
+
     # Assemble input structure and query Windows for volume bitmap.
-    # The input structure is the number 0 as a signed 64 bit integer.
-    input_struct = struct.pack('q', 0)
+    # The input structure is the starting LCN as a signed 64 bit integer.
+    input_struct = _Q_STRUCT.pack(starting_lcn)
 
     # Figure out the buffer size. Add small fudge factor to ensure success.
-    buf_size = int(total_clusters / 8) + 16 + 64
+    buf_size = int((total_clusters - starting_lcn) / 8) + 16 + 64
 
     vb_struct = DeviceIoControl(volume_handle, FSCTL_GET_VOLUME_BITMAP,
                                 input_struct, buf_size)
@@ -657,17 +891,16 @@ def get_volume_bitmap(volume_handle, total_clusters):
     # Process content of the first part of structure.
     # Separate the volume bitmap up front, so we are not making too
     # many string copies of it.
-    chunk_size = struct.calcsize('2q')
-    volume_bitmap = vb_struct[chunk_size:]
-    vb_struct = vb_struct[:chunk_size]
-    starting_lcn, vb_struct = unpack_element('q', vb_struct)    # 8 bytes
-    bitmap_size, vb_struct = unpack_element('q', vb_struct)     # 8 bytes
+    volume_bitmap = vb_struct[_QQ_STRUCT.size:]
+    returned_lcn, bitmap_size = _QQ_STRUCT.unpack_from(vb_struct)
 
-    # If we make the GET_VOLUME_BITMAP request with 0,
-    # this should always come back 0.
-    assert starting_lcn == 0
+    # The starting LCN comes back as requested; it was aligned above,
+    # so Windows does not round it further.
+    assert returned_lcn == starting_lcn
 
     # The remaining part of the structure is the actual bitmap.
+    _bitmap_cache[cache_key] = (time.monotonic(), volume_bitmap,
+                                bitmap_size)
     return volume_bitmap, bitmap_size
 
 
@@ -682,15 +915,18 @@ def get_ntfs_volume_data(volume_handle):
 
     # At this point we have a FSCTL_GET_NTFS_VOLUME_DATA (vd) structure.
     # Pick out the elements from structure that are useful to us.
-    _,              vd_struct = unpack_element('q', vd_struct)     # 8 bytes
-    number_sectors, vd_struct = unpack_element('q', vd_struct)     # 8 bytes
-    total_clusters, vd_struct = unpack_element('q', vd_struct)     # 8 bytes
-    free_clusters,  vd_struct = unpack_element('q', vd_struct)     # 8 bytes
-    total_reserved, vd_struct = unpack_element('q', vd_struct)     # 8 bytes
-    _,              vd_struct = unpack_element('4I', vd_struct)    # 4*4 bytes
-    _,              vd_struct = unpack_element('3q', vd_struct)    # 3*8 bytes
-    mft_zone_start, vd_struct = unpack_element('q', vd_struct)     # 8 bytes
-    mft_zone_end,   vd_struct = unpack_element('q', vd_struct)     # 8 bytes
+    # One unpack of the leading 96 bytes replaces nine unpack_element()
+    # calls that each resliced the buffer into a fresh bytes object.
+    (_,                               # 8 bytes
+     number_sectors,                  # 8 bytes
+     total_clusters,                  # 8 bytes
+     free_clusters,                   # 8 bytes
+     total_reserved,                  # 8 bytes
+     _, _, _, _,                      # 4*4 bytes
+     _, _, _,                         # 3*8 bytes
+     mft_zone_start,                  # 8 bytes
+     mft_zone_end,                    # 8 bytes
+     ) = _VOLUME_DATA_STRUCT.unpack_from(vd_struct)
 
     # Quick sanity check that we got something reasonable for MFT zone.
     assert (mft_zone_start < mft_zone_end and
@@ -707,22 +943,60 @@ def get_ntfs_volume_data(volume_handle):
 # In later versions of Windows, this seems to be instantaneous.
 def poll_clusters_freed(volume_handle, total_clusters, orig_extents):
     polling_duration_seconds = 7
-    attempts_per_second = 10
 
     if not orig_extents:
         return True
 
-    for _ in range(polling_duration_seconds * attempts_per_second):
-        volume_bitmap, bitmap_size = get_volume_bitmap(volume_handle,
-                                                       total_clusters)
-        count_free, count_allocated = check_extents(
-            orig_extents, volume_bitmap)
+    # Fetch only the bitmap window covering the extents, and check
+    # with cluster numbers relative to the window start.
+    window_start = min(lcn_start for lcn_start, lcn_end
+                       in orig_extents) & ~7
+    window_end = max(lcn_end for lcn_start, lcn_end in orig_extents)
+    rel_extents = [(lcn_start - window_start, lcn_end - window_start)
+                   for lcn_start, lcn_end in orig_extents]
+    cluster_total = sum(lcn_end - lcn_start + 1
+                        for lcn_start, lcn_end in orig_extents)
+
+    # Exponential backoff: on recent Windows the clusters are released
+    # immediately, so the first retries come quickly (10 ms) instead of
+    # always paying the old fixed 100 ms granularity; when the NTFS
+    # checkpoint is delayed, the interval doubles up to 100 ms so we
+    # are not hammering the volume with bitmap fetches for 7 seconds.
+    delay_ms = 10
+    elapsed_ms = 0
+    # The first cluster of the first extent serves as a cheap probe:
+    # the checkpoint frees the file's clusters together, so while the
+    # probe is still allocated the round skips the per-extent popcount
+    # tally below. Like the measure below, this is inexact when another
+    # process grabs the cluster meanwhile.
+    probe_lcn = orig_extents[0][0]
+
+    while elapsed_ms < polling_duration_seconds * 1000:
+        volume_bitmap, bitmap_size = get_volume_bitmap(
+            volume_handle, total_clusters,
+            lcn_range=(window_start, window_end))
+        if check_mapped_bit(volume_bitmap, probe_lcn - window_start):
+            Sleep(delay_ms)
+            elapsed_ms += delay_ms
+            delay_ms = min(delay_ms * 2, 100)
+            continue
         # Some inexact measure to determine if our clusters were freed
         # by the OS, knowing that another process may grab some clusters
-        # in between our polling attempts.
-        if count_free > count_allocated:
+        # in between our polling attempts. Only the allocated count is
+        # needed — the total is fixed — and the scan stops early once
+        # the majority is known to be still allocated, since the rest
+        # of the extents cannot change this round's outcome.
+        count_allocated = 0
+        for lcn_start, lcn_end in rel_extents:
+            count_allocated += _extent_popcount(volume_bitmap,
+                                                lcn_start, lcn_end)
+            if count_allocated * 2 >= cluster_total:
+                break
+        if count_allocated * 2 < cluster_total:
             return True
-        Sleep(1000 / attempts_per_second)
+        Sleep(delay_ms)
+        elapsed_ms += delay_ms
+        delay_ms = min(delay_ms * 2, 100)
 
     return False
 
@@ -735,37 +1009,76 @@ def move_file(volume_handle, file_handle, starting_vcn,
               starting_lcn, cluster_count):
     # Assemble input structure for our request.
     # We include a couple of zero ints for 64-bit alignment.
-    input_struct = struct.pack('IIqqII', int(file_handle), 0, starting_vcn,
-                               starting_lcn, cluster_count, 0)
+    input_struct = _MOVE_FILE_STRUCT.pack(int(file_handle), 0, starting_vcn,
+                                          starting_lcn, cluster_count, 0)
     vb_struct = DeviceIoControl(volume_handle, FSCTL_MOVE_FILE,
                                 input_struct, None)
 
 
 # Write zero-fill to a file.
 # Write_length is the number of bytes to be written.
-def write_zero_fill(file_handle, write_length):
-    # Bytearray will be initialized with null bytes as part of constructor.
-    fill_string = bytearray(write_buf_size)
+# The zero-fill buffer never changes, so one module-level instance
+# serves every write. wipe_extent_by_defrag() calls write_zero_fill()
+# once per extent, and constructing a fresh half-megabyte buffer each
+# time was measurable on fragmented files. An anonymous mmap is
+# page-aligned, which handles opened with FILE_FLAG_NO_BUFFERING
+# require for the kernel to write without bounce-buffering; a plain
+# bytes object is only pointer-aligned.
+_zero_fill_buf = mmap.mmap(-1, write_buf_size)
+_zero_fill_view = memoryview(_zero_fill_buf)
+
+
+# Match the write buffer to the volume: one buffered write should cover
+# at least 64 clusters, so volumes formatted with large clusters do not
+# pay per-call overhead for every couple of clusters. The size is
+# bounded to keep writes cache-friendly, and the zero-fill buffer is
+# reallocated only when the size actually changes.
+def _tune_write_buf_size(cluster_size):
+    global write_buf_size, _zero_fill_buf, _zero_fill_view
+    size = min(_write_buf_size_max,
+               max(_write_buf_size_min, cluster_size * 64))
+    if size != write_buf_size:
+        logger.debug("Tuning write buffer to %d bytes "
+                     "for cluster size %d", size, cluster_size)
+        write_buf_size = size
+        _zero_fill_buf = mmap.mmap(-1, size)
+        _zero_fill_view = memoryview(_zero_fill_buf)
+
+
+# Overlapped (async) writes with a ring of buffers in flight were
+# considered here and rejected: the zero-fill file handle is opened
+# without FILE_FLAG_NO_BUFFERING or WRITE_THROUGH, so WriteFile only
+# copies into the cache manager and returns; the single flush at the
+# end is where the disk wait happens either way.
+# A ctypes kernel32.WriteFile call was also considered and rejected:
+# pywin32 already passes the mmap-backed memoryview straight through
+# the buffer protocol without a user-mode copy, so its remaining
+# per-call cost is amortized over half-megabyte writes.
+def write_zero_fill(file_handle, write_length, flush=True):
+    fill_string = _zero_fill_view
     assert len(fill_string) == write_buf_size
 
     # Loop and perform writes of write_buf_size bytes or less.
     # Continue until write_length bytes have been written.
     # There is no need to explicitly move the file pointer while
     # writing. We are writing contiguously.
+    write_file = WriteFile     # local alias for the loop
     while write_length > 0:
         if write_length >= write_buf_size:
             write_string = fill_string
             write_length -= write_buf_size
         else:
-            write_string = fill_string[:write_length]
+            # A memoryview avoids copying the buffer for the tail.
+            write_string = memoryview(fill_string)[:write_length]
             write_length = 0
 
         # Write buffer to file.
         #logger.debug("Write %d bytes", len(write_string))
-        _, bytes_written = WriteFile(file_handle, write_string)
+        _, bytes_written = write_file(file_handle, write_string)
         assert bytes_written == len(write_string)
 
-    FlushFileBuffers(file_handle)
+    if flush:
+        FlushFileBuffers(file_handle)
 
 
 # Wipe the file using the extents list we have built.
@@ -779,11 +1092,15 @@ def wipe_file_direct(file_handle, extents, cluster_size, file_size):
 
     if extents:
         # Use size on disk to determine how many clusters of zeros we write.
+        # One flush at the end covers all the extents; flushing after
+        # each one serialized the whole write against the disk once per
+        # fragment.
         for lcn_start, lcn_end in extents:
             # logger.debug("Wiping extent from %d to %d...",
             #              lcn_start, lcn_end)
             write_length = (lcn_end - lcn_start + 1) * cluster_size
-            write_zero_fill(file_handle, write_length)
+            write_zero_fill(file_handle, write_length, flush=False)
+        FlushFileBuffers(file_handle)
     else:
         # Special case - file so small it can be contained within the
         # directory entry in the MFT part of the disk.
@@ -806,85 +1123,149 @@ def wipe_file_direct(file_handle, extents, cluster_size, file_size):
 def wipe_extent_by_defrag(volume_handle, lcn_start, lcn_end, cluster_size,
                           total_clusters, tmp_file_path):
     assert cluster_size > 0
-    logger.debug("Examining extent from %d to %d for wipe...",
-                 lcn_start, lcn_end)
-    write_length = (lcn_end - lcn_start + 1) * cluster_size
-
-    # Check the state of the volume bitmap for the extent we want to
-    # overwrite. If any sectors are allocated, reduce the task
-    # into smaller parts.
-    # We also reduce to smaller pieces if the extent is larger than
-    # 2 megabytes. For no particular reason except to avoid the entire
-    # request failing because one cluster became allocated.
-    volume_bitmap, bitmap_size = get_volume_bitmap(volume_handle,
-                                                   total_clusters)
-    # This option simulates another process that grabs clusters on disk
-    # from time to time.
-    # It should be moved away after QA is complete.
-    if not simulate_concurrency:
-        count_free, count_allocated = check_extents(
-            [(lcn_start, lcn_end)], volume_bitmap)
-    else:
-        count_free, count_allocated = check_extents_concurrency(
-            [(lcn_start, lcn_end)], volume_bitmap,
-            tmp_file_path, volume_handle, total_clusters)
-    if count_allocated > 0 and count_free == 0:
-        return False
-    if count_allocated > 0 or write_length > write_buf_size * 4:
-        if lcn_start >= lcn_end:
-            return False
-
-        for split_s, split_e in split_extent(lcn_start, lcn_end):
-            wipe_extent_by_defrag(volume_handle, split_s, split_e,
-                                  cluster_size, total_clusters,
-                                  tmp_file_path)
-        return True
-    # Put the zero-fill file in place.
-    file_handle = CreateFile(tmp_file_path, GENERIC_READ | GENERIC_WRITE,
-                             0, None, CREATE_ALWAYS,
-                             FILE_ATTRIBUTE_HIDDEN, None)
-    write_zero_fill(file_handle, write_length)
-    new_extents = get_extents(file_handle)
-
-    # We know the original extent was contiguous.
-    # The new zero-fill file may not be contiguous, so it requires a
-    # loop to be sure of reaching the end of the new file's clusters.
-    new_vcn = 0
-    for new_lcn_start, new_lcn_end in new_extents:
-        # logger.debug("Zero-fill wrote from %d to %d",
-        #                   new_lcn_start, new_lcn_end)
-        cluster_count = new_lcn_end - new_lcn_start + 1
-        cluster_dest = lcn_start + new_vcn
-
-        if new_lcn_start != cluster_dest:
-            logger.debug("Move %d clusters to %d",
-                         cluster_count, cluster_dest)
-            try:
-                move_file(volume_handle, file_handle, new_vcn,
-                          cluster_dest, cluster_count)
-            except:
-                # Move file failed, probably because another process
-                # has allocated a cluster on disk.
-                # Break into smaller pieces and do what we can.
-                logger.debug("!! Move encountered an error !!")
-                CloseHandle(file_handle)
-                if lcn_start >= lcn_end:
-                    return False
-                for split_s, split_e in split_extent(lcn_start, lcn_end):
-                    wipe_extent_by_defrag(volume_handle, split_s, split_e,
-                                          cluster_size, total_clusters,
-                                          tmp_file_path)
-                return True
+    # An explicit worklist replaces the former recursion. Free runs and
+    # size splits are pushed back onto the deque and handled by the same
+    # loop, so a badly fragmented multi-gigabyte extent cannot pile up
+    # interpreter frames, and every sub-extent goes through the one
+    # (cached) bitmap fetch below.
+    result = True
+    original = True
+    work = deque()
+    work.append((lcn_start, lcn_end))
+    while work:
+        lcn_start, lcn_end = work.popleft()
+        logger.debug("Examining extent from %d to %d for wipe...",
+                     lcn_start, lcn_end)
+        write_length = (lcn_end - lcn_start + 1) * cluster_size
+
+        # Check the state of the volume bitmap for the extent we want to
+        # overwrite. If any sectors are allocated, reduce the task
+        # into smaller parts.
+        # We also reduce to smaller pieces if the extent is larger than
+        # 2 megabytes. For no particular reason except to avoid the entire
+        # request failing because one cluster became allocated.
+        # This option simulates another process that grabs clusters on disk
+        # from time to time.
+        # It should be moved away after QA is complete.
+        if not simulate_concurrency:
+            # Fetch only the bitmap window covering this extent; cluster
+            # numbers inside the window are relative to base_lcn.
+            base_lcn = lcn_start & ~7
+            volume_bitmap, bitmap_size = get_volume_bitmap(
+                volume_handle, total_clusters, allow_cached=True,
+                lcn_range=(lcn_start, lcn_end))
+            count_free, count_allocated = check_extents(
+                [(lcn_start - base_lcn, lcn_end - base_lcn)], volume_bitmap)
         else:
-            # If Windows put the zero-fill extent on the exact clusters we
-            # intended to place it, no need to attempt a move.
-            logging.debug("No need to move extent from %d",
-                          new_lcn_start)
-        new_vcn += cluster_count
+            # The simulator spikes absolute clusters, so it keeps the
+            # whole bitmap.
+            base_lcn = 0
+            volume_bitmap, bitmap_size = get_volume_bitmap(volume_handle,
+                                                           total_clusters,
+                                                           allow_cached=True)
+            count_free, count_allocated = check_extents_concurrency(
+                [(lcn_start, lcn_end)], volume_bitmap,
+                tmp_file_path, volume_handle, total_clusters)
+        if count_allocated > 0 and count_free == 0:
+            # The recursive version returned False here; sub-extents
+            # that turn out fully allocated are simply dropped.
+            if original:
+                result = False
+            original = False
+            continue
+        if count_allocated > 0:
+            if lcn_start >= lcn_end:
+                if original:
+                    result = False
+                original = False
+                continue
+            original = False
+            # Jump straight to the free runs inside the extent instead of
+            # splitting blindly by powers of ten and rediscovering the
+            # same allocated clusters at every pass over the worklist.
+            work.extend(
+                (base_lcn + run_start, base_lcn + run_end)
+                for run_start, run_end in check_extents_free_runs(
+                    [(lcn_start - base_lcn, lcn_end - base_lcn)],
+                    volume_bitmap))
+            continue
+        if write_length > write_buf_size * 4:
+            if lcn_start >= lcn_end:
+                if original:
+                    result = False
+                original = False
+                continue
+            original = False
+            work.extend(split_extent(lcn_start, lcn_end))
+            continue
+        original = False
+        # Put the zero-fill file in place.
+        file_handle = CreateFile(tmp_file_path, GENERIC_READ | GENERIC_WRITE,
+                                 0, None, CREATE_ALWAYS,
+                                 FILE_ATTRIBUTE_HIDDEN, None)
+        # Reserve the full length up front, so NTFS allocates the clusters
+        # in one operation and, when it can, as one contiguous run. That
+        # leaves fewer extents to move afterwards than growing the file one
+        # buffer at a time. The explicit zero fill that follows is not
+        # optional: clusters reserved beyond the valid data length keep
+        # their old on-disk contents, and the wipe guarantee must not rest
+        # on NTFS zeroing them lazily on some later access.
+        SetFilePointer(file_handle, write_length, FILE_BEGIN)
+        SetEndOfFile(file_handle)
+        SetFilePointer(file_handle, 0, FILE_BEGIN)
+        write_zero_fill(file_handle, write_length)
+        new_extents = get_extents(file_handle)
 
-    CloseHandle(file_handle)
-    DeleteFile(tmp_file_path)
-    return True
+        # We know the original extent was contiguous.
+        # The new zero-fill file may not be contiguous, so it requires a
+        # loop to be sure of reaching the end of the new file's clusters.
+        # FSCTL_MOVE_FILE takes a single MOVE_FILE_DATA record, so the
+        # moves cannot be batched into one call; the preallocation above
+        # is what keeps this loop short, because a contiguous zero-fill
+        # file needs exactly one move. NTFS already reports maximal runs,
+        # so there are no adjacent extents here to merge.
+        move_failed = False
+        new_vcn = 0
+        for new_lcn_start, new_lcn_end in new_extents:
+            # logger.debug("Zero-fill wrote from %d to %d",
+            #                   new_lcn_start, new_lcn_end)
+            cluster_count = new_lcn_end - new_lcn_start + 1
+            cluster_dest = lcn_start + new_vcn
+
+            if new_lcn_start != cluster_dest:
+                logger.debug("Move %d clusters to %d",
+                             cluster_count, cluster_dest)
+                try:
+                    move_file(volume_handle, file_handle, new_vcn,
+                              cluster_dest, cluster_count)
+                except:
+                    # Move file failed, probably because another process
+                    # has allocated a cluster on disk.
+                    # Break into smaller pieces and do what we can.
+                    logger.debug("!! Move encountered an error !!")
+                    CloseHandle(file_handle)
+                    # Earlier moves in this loop already changed the
+                    # allocation state, so make the retries below fetch
+                    # a fresh bitmap.
+                    _invalidate_volume_bitmap_cache()
+                    if lcn_start < lcn_end:
+                        work.extend(split_extent(lcn_start, lcn_end))
+                    move_failed = True
+                    break
+            else:
+                # If Windows put the zero-fill extent on the exact clusters we
+                # intended to place it, no need to attempt a move.
+                logging.debug("No need to move extent from %d",
+                              new_lcn_start)
+            new_vcn += cluster_count
+
+        if move_failed:
+            continue
+        CloseHandle(file_handle)
+        DeleteFile(tmp_file_path)
+        # The zero-fill file came and went, so any cached bitmap is stale.
+        _invalidate_volume_bitmap_cache()
+    return result
 
 
 # Clean up open handles etc.
@@ -911,6 +1292,8 @@ def file_wipe(file_name):
     volume_info = get_volume_information(volume)
     cluster_size = (volume_info.sectors_per_cluster *
                     volume_info.bytes_per_sector)
+    total_clusters = volume_info.total_clusters
+    _tune_write_buf_size(cluster_size)
 
     file_handle = open_file(file_name)
     file_size, is_special = get_file_basic_info(file_name, file_handle)
@@ -943,7 +1326,10 @@ def file_wipe(file_name):
         # Any extent within new_extents has now been wiped by above.
         # It can be subtracted from the orig_extents list, and now we will
         # just clean up anything not yet overwritten.
-        orig_extents = extents_a_minus_b(orig_extents, new_extents)
+        # Materialize the subtraction: the result is consumed by the
+        # freed-cluster polling and again by the defrag loop below, and
+        # a generator would be exhausted after the first pass.
+        orig_extents = list(extents_a_minus_b(orig_extents, new_extents))
     else:
         # File needs special treatment. We can't just do a basic overwrite.
         # First we will truncate it. Then chase down the freed clusters to
@@ -952,8 +1338,7 @@ def file_wipe(file_name):
         CloseHandle(file_handle)
 
     # Poll to confirm that our clusters were freed.
-    poll_clusters_freed(volume_handle, volume_info.total_clusters,
-                        orig_extents)
+    poll_clusters_freed(volume_handle, total_clusters, orig_extents)
 
     # Chase down all the freed clusters we can, and wipe them.
     #logger.debug("Attempting defrag file wipe.")
@@ -961,12 +1346,16 @@ def file_wipe(file_name):
     # Should be able to write this path if user can write the wipe file.
     tmp_file_path = os.path.dirname(file_name) + os.sep + tmp_file_name
     if is_special:
-        orig_extents = choose_if_bridged(volume_handle,
-                                         volume_info.total_clusters,
+        orig_extents = choose_if_bridged(volume_handle, total_clusters,
                                          orig_extents, bridged_extents)
+    # Merge neighboring extents so each write/move cycle covers as much
+    # of the file as possible. This runs after both sources of extents:
+    # the subtraction left over from the direct wipe and the bridged
+    # extents chosen for special files.
+    orig_extents = _coalesce_extents(orig_extents)
     for lcn_start, lcn_end in orig_extents:
         result = wipe_extent_by_defrag(volume_handle, lcn_start, lcn_end,
-                                       cluster_size, volume_info.total_clusters,
+                                       cluster_size, total_clusters,
                                        tmp_file_path)
 
     # Clean up.